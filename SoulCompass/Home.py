@@ -2,6 +2,10 @@ import streamlit as st
 from PIL import Image
 import os
 
+from utils.database import get_law_of_one_loader
+from utils.metrics import metrics
+from utils.profiling import start_profile, finish_profile
+
 # Set page configuration
 st.set_page_config(
     page_title="SoulCompass: AI-Powered Channeled Insights",
@@ -10,6 +14,12 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
+# Time this rerun of the page (when metrics are enabled)
+render_start = metrics.start_timer()
+
+# Profile this rerun (SOULCOMPASS_PROFILE=1, or ?profile=1 if SOULCOMPASS_PROFILE_ALLOW_QUERY=1)
+profiler = start_profile()
+
 # Custom CSS for styling
 def load_css():
     css = """
@@ -84,6 +94,10 @@ def load_css():
 # Load CSS
 load_css()
 
+# Start loading the shared Law of One database in the background as soon as the
+# app is opened, so the Ra Chatbot and Energy Reading Journal pages find it ready
+get_law_of_one_loader()
+
 # Display logo and header
 logo_path = os.path.join(os.path.dirname(__file__), "assets", "logo.png")
 if os.path.exists(logo_path):
@@ -150,3 +164,6 @@ st.markdown("""
 <p>SoulCompass is inspired by The Law of One material from <a href="https://www.lawofone.info/" target="_blank">lawofone.info</a></p>
 </div>
 """, unsafe_allow_html=True)
+
+metrics.observe_since('soulcompass_page_render_seconds', render_start, page='home')
+finish_profile(profiler, 'home')
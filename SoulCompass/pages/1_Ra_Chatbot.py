@@ -1,13 +1,21 @@
 import streamlit as st
 import random
-import time
 from PIL import Image
 import os
 import sys
 
 # Add the parent directory to sys.path to import the utils
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.law_of_one import LawOfOneDatabase
+from utils.database import get_law_of_one_db, show_load_progress
+from utils.metrics import metrics
+from utils.profiling import start_profile, finish_profile
+
+# Optional pause (in seconds) before Ra's newest answer fades in, for a more contemplative
+# feel. It is a CSS animation delay in the browser, so no server thread waits on it
+RESPONSE_DELAY = float(os.environ.get("SOULCOMPASS_RESPONSE_DELAY", "0"))
+
+# Show the search latency debug panel (also enabled per visit with ?debug=1)
+DEBUG = os.environ.get("SOULCOMPASS_DEBUG", "") == "1"
 
 # Set page configuration
 st.set_page_config(
@@ -17,6 +25,12 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
+# Time this rerun of the page (when metrics are enabled)
+render_start = metrics.start_timer()
+
+# Profile this rerun (SOULCOMPASS_PROFILE=1, or ?profile=1 if SOULCOMPASS_PROFILE_ALLOW_QUERY=1)
+profiler = start_profile()
+
 # Custom CSS for styling
 def load_css():
     css = """
@@ -95,6 +109,15 @@ def load_css():
         word-wrap: break-word;
     }
 
+    /* Ra's newest answer fades in after the optional response delay */
+    .ra-message-new {
+        animation: ra-appear 0.6s ease-in both;
+    }
+    @keyframes ra-appear {
+        from { opacity: 0; }
+        to { opacity: 1; }
+    }
+
     /* Glowing effect for special elements */
     .glow {
         text-shadow: 0 0 10px var(--primary-color);
@@ -133,14 +156,12 @@ if 'chat_history' not in st.session_state:
 if "clear_input" not in st.session_state:
     st.session_state.clear_input = False
 
-# Initialize the Law of One database
-@st.cache_resource
-def load_law_of_one_db():
-    return LawOfOneDatabase()
+# Set when Ra has just answered, so only that answer gets the fade-in
+if "new_response" not in st.session_state:
+    st.session_state.new_response = False
 
-# Use a spinner while loading the database
-with st.spinner("Connecting to the Law of One database..."):
-    law_of_one_db = load_law_of_one_db()
+# Use the Law of One database shared by all pages; None until its background load finishes
+law_of_one_db = get_law_of_one_db()
 
 # Ra's fallback responses for when no good match is found
 ra_fallback_responses = {
@@ -171,11 +192,12 @@ def generate_ra_response(user_input):
     elif any(word in user_input_lower for word in ["bye", "goodbye", "farewell", "see you"]):
         return random.choice(ra_fallback_responses["farewell"])
     
+    # Answer from the fallbacks until the database has loaded
+    if law_of_one_db is None:
+        return random.choice(ra_fallback_responses["default"])
+    
     # Search the Law of One database for relevant answers
     try:
-        # Add a small delay to simulate "thinking"
-        time.sleep(1)
-        
         # Get response from the Law of One database
         response = law_of_one_db.get_ra_response(user_input)
         return response
@@ -187,6 +209,10 @@ def generate_ra_response(user_input):
 st.markdown("<h1 class='glow'>Ra Chatbot</h1>", unsafe_allow_html=True)
 st.markdown("<h3>Communicate with an AI trained on The Law of One</h3>", unsafe_allow_html=True)
 
+# Show the database load while it is still running (Ra answers from the fallbacks meanwhile)
+if law_of_one_db is None:
+    show_load_progress()
+
 # Information about Ra
 st.markdown("""
 <div class="card">
@@ -204,12 +230,16 @@ st.markdown("<h2>Ask Ra</h2>", unsafe_allow_html=True)
 
 # Display chat history
 st.markdown('<div class="chat-container">', unsafe_allow_html=True)
-for message in st.session_state.chat_history:
+last_index = len(st.session_state.chat_history) - 1
+for i, message in enumerate(st.session_state.chat_history):
     if message["role"] == "user":
         st.markdown(f'<div class="user-message">{message["content"]}</div>', unsafe_allow_html=True)
+    elif i == last_index and st.session_state.new_response:
+        st.markdown(f'<div class="ra-message ra-message-new" style="animation-delay: {RESPONSE_DELAY}s">{message["content"]}</div>', unsafe_allow_html=True)
     else:
         st.markdown(f'<div class="ra-message">{message["content"]}</div>', unsafe_allow_html=True)
 st.markdown('</div>', unsafe_allow_html=True)
+st.session_state.new_response = False
 
 # If the clear_input flag is set, clear it and return an empty string as the default value
 user_input_default = ""
@@ -243,16 +273,17 @@ with col2:
             
             # Add Ra's response to chat history
             st.session_state.chat_history.append({"role": "ra", "content": ra_response})
+            st.session_state.new_response = True
             
             # Use a flag to clear input on next rerun instead of directly modifying session state
             st.session_state.clear_input = True
             
             # Rerun to update the chat display
-            st.experimental_rerun()
+            st.rerun()
 with col3:
     if st.button("Clear Chat"):
         st.session_state.chat_history = []
-        st.experimental_rerun()
+        st.rerun()
 
 # Sample questions
 st.markdown("<h3>Sample Questions</h3>", unsafe_allow_html=True)
@@ -269,9 +300,27 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
+# Search latency debug panel
+if DEBUG or st.query_params.get("debug") == "1":
+    with st.sidebar.expander("Debug: search latency", expanded=True):
+        summary = law_of_one_db.search_latency.summary() if law_of_one_db is not None else None
+        if summary and summary['count']:
+            col_p50, col_p95 = st.columns(2)
+            col_p50.metric("p50", f"{summary['p50'] * 1000:.1f} ms")
+            col_p95.metric("p95", f"{summary['p95'] * 1000:.1f} ms")
+            st.caption(f"{summary['count']} searches; slowest recent search {summary['max'] * 1000:.1f} ms")
+        else:
+            st.caption("No searches yet")
+        if law_of_one_db is not None:
+            cache = law_of_one_db.response_cache.stats()
+            st.caption(f"Response cache: {cache['hits']} hits, {cache['misses']} misses, {cache['size']}/{cache['max_size']} entries")
+
 # Footer
 st.markdown("""
 <div style="text-align: center; margin-top: 50px; padding: 20px; font-size: 0.8em;">
 <p>This chatbot is inspired by The Law of One material from <a href="https://www.lawofone.info/" target="_blank">lawofone.info</a></p>
 </div>
 """, unsafe_allow_html=True)
+
+metrics.observe_since('soulcompass_page_render_seconds', render_start, page='ra_chatbot')
+finish_profile(profiler, 'ra_chatbot')
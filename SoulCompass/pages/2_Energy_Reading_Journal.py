@@ -1,14 +1,17 @@
 import streamlit as st
-import pandas as pd
 import datetime
-import random
 import os
 import sys
 from PIL import Image
 
 # Add the parent directory to sys.path to import the utils
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.law_of_one import LawOfOneDatabase
+from utils.database import get_law_of_one_db, get_journal_store, get_journal_owner, show_load_progress, start_insight_refresh
+from utils.journal_store import ENTRY_TYPES, RATING_LABELS
+from utils.journal_export import export_formats, iter_export
+from utils.insights import generate_insight
+from utils.metrics import metrics
+from utils.profiling import start_profile, finish_profile
 
 # Set page configuration
 st.set_page_config(
@@ -18,6 +21,12 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
+# Time this rerun of the page (when metrics are enabled)
+render_start = metrics.start_timer()
+
+# Profile this rerun (SOULCOMPASS_PROFILE=1, or ?profile=1 if SOULCOMPASS_PROFILE_ALLOW_QUERY=1)
+profiler = start_profile()
+
 # Custom CSS for styling
 def load_css():
     css = """
@@ -110,9 +119,13 @@ def load_css():
 # Load CSS
 load_css()
 
-# Initialize session state for journal entries if it doesn't exist
-if 'journal_entries' not in st.session_state:
-    st.session_state.journal_entries = []
+# Journal entries are kept in a SQLite store, so they survive reloads and restarts,
+# under an owner id so each visitor only ever sees their own journal
+journal_store = get_journal_store()
+journal_owner = get_journal_owner()
+
+# Journal history page sizes (only one page of entries is rendered per rerun)
+HISTORY_PAGE_SIZES = [10, 25, 50]
 
 # Initialize form clearing flags
 if 'clear_emotion_form' not in st.session_state:
@@ -122,84 +135,22 @@ if 'clear_dream_form' not in st.session_state:
 if 'clear_sync_form' not in st.session_state:
     st.session_state.clear_sync_form = False
 
-# Initialize the Law of One database
-@st.cache_resource
-def load_law_of_one_db():
-    return LawOfOneDatabase()
-
-# Use a spinner while loading the database
-with st.spinner("Connecting to the Law of One database..."):
-    law_of_one_db = load_law_of_one_db()
-
-# Fallback insights if database search fails
-fallback_insights = {
-    "emotions": [
-        "I am Ra. The emotions you are experiencing are catalysts for spiritual growth. Remember that all is one, and these feelings are part of the Creator experiencing itself.",
-        "I am Ra. Your emotional state is a distortion of the One Infinite Creator. By accepting and balancing these emotions, you move closer to understanding the Law of One.",
-        "I am Ra. The emotions you describe are vibrations that can be balanced through meditation and contemplation. As you balance these energies, you open pathways to intelligent infinity."
-    ],
-    "dreams": [
-        "I am Ra. The dream state offers access to the deeper portions of the mind complex, where symbols and archetypes reside. Your dream contains symbols that reflect your current spiritual journey.",
-        "I am Ra. Dreams often serve as a bridge between your conscious mind and the cosmic mind. The imagery you describe suggests communication from your higher self regarding your spiritual path.",
-        "I am Ra. In the dream state, the veil between densities thins, allowing glimpses of other realities and potentials."
-    ],
-    "synchronicities": [
-        "I am Ra. What you call synchronicity is often the higher self communicating through the illusion of space/time. These patterns indicate alignment with your spiritual purpose.",
-        "I am Ra. Synchronicities are moments when the veil thins, allowing you to perceive the interconnectedness of all things. They often appear when you are moving in harmony with your pre-incarnative choices.",
-        "I am Ra. The meaningful coincidences you describe are manifestations of the Law of One in action."
-    ]
-}
-
-# Function to generate insights based on journal entry
-def generate_insight(entry_type, entry_text):
-    try:
-        # First, try to get a relevant response from the Law of One database
-        if entry_type == "emotions":
-            search_query = f"emotions {entry_text}"
-        elif entry_type == "dreams":
-            search_query = f"dreams {entry_text}"
-        elif entry_type == "synchronicities":
-            search_query = f"synchronicity {entry_text}"
-        
-        # Search the database
-        results = law_of_one_db.search(search_query)
-        
-        if results:
-            # Use the most relevant answer
-            best_match = results[0]
-            insight = best_match['answer']
-            
-            # Add a source reference
-            source_ref = f"\n\n[From Session {best_match['session_id']}]"
-            
-            # Ensure it starts with Ra's greeting if it doesn't already
-            if not insight.startswith("I am Ra"):
-                insight = "I am Ra. " + insight
-                
-            # Add personalized elements based on the entry text
-            if "challenge" in entry_text.lower() or "difficult" in entry_text.lower():
-                personalized = " The challenges you face are opportunities for polarization and growth toward the Creator."
-            elif "joy" in entry_text.lower() or "happy" in entry_text.lower():
-                personalized = " Your experience of joy is a glimpse of the true nature of the Creator, which is infinite love and light."
-            elif "confused" in entry_text.lower() or "uncertain" in entry_text.lower():
-                personalized = " Confusion is often a precursor to understanding. Sit with this catalyst and allow it to transform within you."
-            elif "meditation" in entry_text.lower():
-                personalized = " Your meditation practice strengthens your connection to intelligent infinity and accelerates your spiritual evolution."
-            else:
-                personalized = " Remember that you are on a unique path of seeking, and each experience brings you closer to understanding the Law of One."
-            
-            return insight + personalized + source_ref
-        else:
-            # Use fallback if no relevant results found
-            return random.choice(fallback_insights[entry_type])
-    except Exception as e:
-        st.error(f"Error generating insight: {e}")
-        return random.choice(fallback_insights[entry_type])
+# Use the Law of One database shared by all pages; None until its background load finishes
+law_of_one_db = get_law_of_one_db()
 
 # Display logo and header
 st.markdown("<h1 class='glow'>Energy Reading Journal</h1>", unsafe_allow_html=True)
 st.markdown("<h3>Log your experiences and receive insights based on The Law of One</h3>", unsafe_allow_html=True)
 
+# Show the database load while it is still running (insights use the fallbacks meanwhile)
+if law_of_one_db is None:
+    show_load_progress()
+else:
+    # Bring insights from an older corpus or another ranking mode up to date in the background
+    insight_refresh = start_insight_refresh(law_of_one_db.corpus_version(), law_of_one_db.ranking)
+    if insight_refresh.is_running():
+        st.caption("Updating the insights of earlier journal entries for the current Law of One database...")
+
 # Information about the journal
 st.markdown("""
 <div class="card">
@@ -212,6 +163,10 @@ serve as catalysts for spiritual growth and evolution.</p>
 </div>
 """, unsafe_allow_html=True)
 
+# Anonymous journals are found again through the key in the page URL
+if journal_owner.startswith("key:"):
+    st.caption("Your journal is private to this page's address: bookmark it to come back to your entries.")
+
 # Journal interface
 st.markdown("<h2>New Journal Entry</h2>", unsafe_allow_html=True)
 
@@ -233,20 +188,12 @@ with tab1:
     
     if emotion_submit and emotion_description:
         # Generate insight
-        insight = generate_insight("emotions", emotion_description)
-        
-        # Create entry
-        entry = {
-            "type": "Emotion",
-            "date": emotion_date,
-            "type": emotion_type,
-            "intensity": emotion_intensity,
-            "description": emotion_description,
-            "insight": insight
-        }
+        insight, insight_version, insight_ranking = generate_insight(law_of_one_db, "Emotion", emotion_description)
         
-        # Add to journal entries
-        st.session_state.journal_entries.append(entry)
+        # Save the entry, with the corpus version and ranking mode behind its insight
+        journal_store.add_entry(journal_owner, "Emotion", emotion_date, emotion_description, insight,
+                                emotion=emotion_type, rating=emotion_intensity,
+                                insight_version=insight_version, insight_ranking=insight_ranking)
         
         # Display success message and insight
         st.success("Entry saved successfully!")
@@ -254,7 +201,7 @@ with tab1:
         
         # Set flag to clear the form on next rerun
         st.session_state.clear_emotion_form = True
-        st.experimental_rerun()
+        st.rerun()
 
 with tab2:
     st.markdown("<h3>Log Your Dream</h3>", unsafe_allow_html=True)
@@ -270,19 +217,11 @@ with tab2:
     
     if dream_submit and dream_description:
         # Generate insight
-        insight = generate_insight("dreams", dream_description)
+        insight, insight_version, insight_ranking = generate_insight(law_of_one_db, "Dream", dream_description)
         
-        # Create entry
-        entry = {
-            "type": "Dream",
-            "date": dream_date,
-            "clarity": dream_clarity,
-            "description": dream_description,
-            "insight": insight
-        }
-        
-        # Add to journal entries
-        st.session_state.journal_entries.append(entry)
+        # Save the entry, with the corpus version and ranking mode behind its insight
+        journal_store.add_entry(journal_owner, "Dream", dream_date, dream_description, insight, rating=dream_clarity,
+                                insight_version=insight_version, insight_ranking=insight_ranking)
         
         # Display success message and insight
         st.success("Entry saved successfully!")
@@ -290,7 +229,7 @@ with tab2:
         
         # Set flag to clear the form on next rerun
         st.session_state.clear_dream_form = True
-        st.experimental_rerun()
+        st.rerun()
 
 with tab3:
     st.markdown("<h3>Log Your Synchronicity</h3>", unsafe_allow_html=True)
@@ -306,19 +245,11 @@ with tab3:
     
     if sync_submit and sync_description:
         # Generate insight
-        insight = generate_insight("synchronicities", sync_description)
-        
-        # Create entry
-        entry = {
-            "type": "Synchronicity",
-            "date": sync_date,
-            "significance": sync_significance,
-            "description": sync_description,
-            "insight": insight
-        }
+        insight, insight_version, insight_ranking = generate_insight(law_of_one_db, "Synchronicity", sync_description)
         
-        # Add to journal entries
-        st.session_state.journal_entries.append(entry)
+        # Save the entry, with the corpus version and ranking mode behind its insight
+        journal_store.add_entry(journal_owner, "Synchronicity", sync_date, sync_description, insight, rating=sync_significance,
+                                insight_version=insight_version, insight_ranking=insight_ranking)
         
         # Display success message and insight
         st.success("Entry saved successfully!")
@@ -326,53 +257,85 @@ with tab3:
         
         # Set flag to clear the form on next rerun
         st.session_state.clear_sync_form = True
-        st.experimental_rerun()
+        st.rerun()
 
 # Journal history
 st.markdown("<h2>Journal History</h2>", unsafe_allow_html=True)
 
-if not st.session_state.journal_entries:
+if not journal_store.count_entries(journal_owner):
     st.info("No journal entries yet. Start by creating a new entry above.")
 else:
-    # Sort entries by date (newest first)
-    sorted_entries = sorted(st.session_state.journal_entries, key=lambda x: x["date"], reverse=True)
+    # Filters, applied by the database
+    filter_col1, filter_col2, filter_col3 = st.columns(3)
+    with filter_col1:
+        history_types = st.multiselect("Entry types", ENTRY_TYPES, default=ENTRY_TYPES, key="history_types")
+    with filter_col2:
+        history_dates = st.date_input("Date range", value=(), key="history_dates")
+    with filter_col3:
+        history_ratings = st.slider("Intensity / clarity / significance", 1, 10, (1, 10), key="history_ratings")
+    
+    # A date range is only complete once both ends are picked
+    start_date = history_dates[0] if len(history_dates) > 0 else None
+    end_date = history_dates[1] if len(history_dates) > 1 else None
+    filters = {
+        "entry_types": history_types,
+        "start_date": start_date,
+        "end_date": end_date,
+        "min_rating": history_ratings[0] if history_ratings[0] > 1 else None,
+        "max_rating": history_ratings[1] if history_ratings[1] < 10 else None
+    }
+    
+    # Pick a page of the matching entries
+    matching = journal_store.count_entries(journal_owner, **filters)
+    page_col1, page_col2, page_col3 = st.columns([1, 1, 2])
+    with page_col1:
+        page_size = st.selectbox("Entries per page", HISTORY_PAGE_SIZES, key="history_page_size")
+    page_count = max(1, -(-matching // page_size))
+    
+    # Stay within range when the filters or page size shrink the page count
+    if st.session_state.get("history_page", 1) > page_count:
+        st.session_state.history_page = page_count
+    with page_col2:
+        page = st.number_input("Page", min_value=1, max_value=page_count, step=1, key="history_page")
+    with page_col3:
+        st.caption(f"{matching} matching entries, page {page} of {page_count}")
     
-    # Display entries
-    for i, entry in enumerate(sorted_entries):
-        entry_date = entry["date"].strftime("%B %d, %Y")
-        entry_type = entry["type"]
+    if not matching:
+        st.info("No journal entries match these filters.")
+    
+    # Display one page of entries, newest first (sorted by the database)
+    for entry in journal_store.list_entries(journal_owner, limit=page_size, offset=(page - 1) * page_size, **filters):
+        entry_date = entry["entry_date"].strftime("%B %d, %Y")
+        entry_type = entry["entry_type"]
         
         # Create expandable section for each entry
         with st.expander(f"{entry_type} - {entry_date}"):
             st.markdown(f'<div class="journal-entry">', unsafe_allow_html=True)
             
             # Display entry details based on type
+            st.markdown(f"**{RATING_LABELS[entry_type]}:** {entry['rating']}/10", unsafe_allow_html=True)
             if entry_type == "Emotion":
-                st.markdown(f"**Intensity:** {entry['intensity']}/10", unsafe_allow_html=True)
-                st.markdown(f"**Type:** {entry['type']}", unsafe_allow_html=True)
-            elif entry_type == "Dream":
-                st.markdown(f"**Clarity:** {entry['clarity']}/10", unsafe_allow_html=True)
-            elif entry_type == "Synchronicity":
-                st.markdown(f"**Significance:** {entry['significance']}/10", unsafe_allow_html=True)
+                st.markdown(f"**Type:** {entry['emotion']}", unsafe_allow_html=True)
             
             st.markdown(f"**Description:** {entry['description']}", unsafe_allow_html=True)
             st.markdown(f'<div class="insight-box"><p><strong>Insight:</strong> {entry["insight"]}</p></div>', unsafe_allow_html=True)
             st.markdown('</div>', unsafe_allow_html=True)
     
     # Option to export journal
+    formats = export_formats()
+    export_col1, export_col2 = st.columns([1, 3])
+    with export_col1:
+        export_format = st.selectbox("Export format", list(formats), key="export_format")
     if st.button("Export Journal"):
-        # Convert journal entries to DataFrame
-        df = pd.DataFrame(st.session_state.journal_entries)
-        
-        # Convert date objects to strings
-        df['date'] = df['date'].apply(lambda x: x.strftime("%Y-%m-%d"))
-        
-        # Save to CSV
-        csv_path = os.path.join(os.path.dirname(__file__), "..", "journal_export.csv")
-        df.to_csv(csv_path, index=False)
-        
-        # Provide download link
-        st.success(f"Journal exported successfully! File saved to {csv_path}")
+        # The export is generated chunk by chunk from the database straight into the
+        # download, so no DataFrame of the whole journal is built and nothing is written to the server
+        extension, mime = formats[export_format]
+        st.download_button(
+            f"Download {export_format}",
+            data=b"".join(iter_export(journal_store, journal_owner, export_format)),
+            file_name=f"journal_export.{extension}",
+            mime=mime
+        )
 
 # Footer
 st.markdown("""
@@ -380,3 +343,6 @@ st.markdown("""
 <p>This journal is inspired by The Law of One material from <a href="https://www.lawofone.info/" target="_blank">lawofone.info</a></p>
 </div>
 """, unsafe_allow_html=True)
+
+metrics.observe_since('soulcompass_page_render_seconds', render_start, page='energy_reading_journal')
+finish_profile(profiler, 'energy_reading_journal')
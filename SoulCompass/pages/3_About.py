@@ -1,6 +1,11 @@
 import streamlit as st
 from PIL import Image
 import os
+import sys
+
+# Add the parent directory to sys.path to import the utils
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.metrics import metrics
 
 # Set page configuration
 st.set_page_config(
@@ -10,6 +15,9 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
+# Time this rerun of the page (when metrics are enabled)
+render_start = metrics.start_timer()
+
 # Custom CSS for styling
 def load_css():
     css = """
@@ -187,3 +195,5 @@ st.markdown("""
 <p>SoulCompass is inspired by The Law of One material from <a href="https://www.lawofone.info/" target="_blank">lawofone.info</a></p>
 </div>
 """, unsafe_allow_html=True)
+
+metrics.observe_since('soulcompass_page_render_seconds', render_start, page='about')
@@ -0,0 +1,148 @@
+import streamlit as st
+import os
+import sys
+
+# Add the parent directory to sys.path to import the utils
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.database import get_metrics_server
+from utils.metrics import metrics, histogram_quantile, METRICS_PORT, METRICS_ADMIN
+
+# Set page configuration
+st.set_page_config(
+    page_title="Metrics | SoulCompass",
+    page_icon="🔮",
+    layout="wide",
+    initial_sidebar_state="expanded",
+)
+
+# Custom CSS for styling
+def load_css():
+    css = """
+    <style>
+    /* Main theme colors - dark mode with blues, purples, and dark rusts */
+    :root {
+        --background-color: #121212;
+        --secondary-bg-color: #1e1e1e;
+        --primary-color: #7b68ee;
+        --secondary-color: #9370db;
+        --accent-color: #a0522d;
+        --text-color: #f0f0f0;
+    }
+
+    /* Apply theme colors */
+    .stApp {
+        background-color: var(--background-color);
+        color: var(--text-color);
+    }
+
+    /* Sidebar styling */
+    .css-1d391kg {
+        background-color: var(--secondary-bg-color);
+    }
+
+    /* Headers */
+    h1, h2, h3 {
+        color: var(--primary-color) !important;
+    }
+
+    /* Buttons */
+    .stButton>button {
+        background-color: var(--primary-color);
+        color: white;
+        border: none;
+        border-radius: 5px;
+        padding: 0.5rem 1rem;
+        transition: all 0.3s ease;
+    }
+    .stButton>button:hover {
+        background-color: var(--secondary-color);
+        box-shadow: 0 0 15px var(--primary-color);
+    }
+
+    /* Card-like containers */
+    .card {
+        background-color: var(--secondary-bg-color);
+        border-radius: 10px;
+        padding: 20px;
+        margin-bottom: 20px;
+        border-left: 3px solid var(--primary-color);
+    }
+
+    /* Glowing effect for special elements */
+    .glow {
+        text-shadow: 0 0 10px var(--primary-color);
+    }
+
+    /* Custom header with logo */
+    .header {
+        display: flex;
+        align-items: center;
+        margin-bottom: 2rem;
+    }
+    .header img {
+        margin-right: 1rem;
+    }
+    </style>
+    """
+    st.markdown(css, unsafe_allow_html=True)
+
+# Load CSS
+load_css()
+
+st.title("Metrics")
+
+if not metrics.enabled:
+    st.info("Metrics are disabled. Start the app with SOULCOMPASS_METRICS=1 to record them.")
+    st.stop()
+
+if METRICS_PORT and get_metrics_server() is not None:
+    st.caption(f"Also served in Prometheus text format on port {METRICS_PORT} at /metrics")
+
+counters, histograms = metrics.snapshot()
+
+def format_labels(labels):
+    return ", ".join(f"{key}={value}" for key, value in labels.items())
+
+def format_value(name, value):
+    if value is None:
+        return ""
+    if name.endswith('_seconds'):
+        return f"{value * 1000:.1f} ms" if value != float('inf') else "> max"
+    return f"{value:g}"
+
+# Timings and per-query sizes; quantiles are bucket upper bounds
+st.subheader("Histograms")
+if histograms:
+    st.dataframe([
+        {
+            'metric': name,
+            'labels': format_labels(labels),
+            'count': histogram['count'],
+            'mean': format_value(name, histogram['sum'] / histogram['count'] if histogram['count'] else None),
+            'p50': format_value(name, histogram_quantile(histogram, 0.5)),
+            'p95': format_value(name, histogram_quantile(histogram, 0.95))
+        }
+        for name, labels, histogram in histograms
+    ], hide_index=True)
+else:
+    st.caption("Nothing recorded yet")
+
+st.subheader("Counters")
+if counters:
+    st.dataframe([
+        {'metric': name, 'labels': format_labels(labels), 'value': value}
+        for name, labels, value in counters
+    ], hide_index=True)
+else:
+    st.caption("Nothing recorded yet")
+
+prometheus_text = metrics.render_prometheus()
+col_download, col_reset = st.columns(2)
+col_download.download_button("Download (Prometheus text)", prometheus_text, file_name="soulcompass_metrics.txt", mime="text/plain")
+# Every visitor can open this page, so only an admin deployment may clear the metrics
+if METRICS_ADMIN and col_reset.button("Reset metrics"):
+    metrics.reset()
+    st.rerun()
+
+with st.expander("Prometheus text"):
+    st.code(prometheus_text, language=None)
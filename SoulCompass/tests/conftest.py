@@ -0,0 +1,50 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# The tests import the app's modules the way the pages do
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils.benchmark import synthetic_corpus
+from utils.fixtures import FixtureServer, synthetic_fixtures
+from utils.law_of_one import LawOfOneDatabase
+
+# A tenth of the real material's size: a few sessions, categories and L/L Research pages
+SCALE = 0.1
+
+def scrape_database(server, cache_file):
+    """A database built by scraping a FixtureServer (no rate limit, parsed in-process), not yet saved"""
+    db = LawOfOneDatabase(lawofone_url=server.lawofone_url, llresearch_url=server.llresearch_url,
+                          parse_workers=0, requests_per_second=0, cache_file=cache_file, load=False,
+                          response_cache_size=0)
+    db._run_build()
+    db._build_index()
+    return db
+
+@pytest.fixture(scope='session')
+def corpus():
+    return synthetic_corpus(SCALE)
+
+@pytest.fixture(scope='session')
+def fixture_server(corpus):
+    with FixtureServer(synthetic_fixtures(corpus)) as server:
+        yield server
+
+@pytest.fixture(scope='session')
+def cache_file(fixture_server, tmp_path_factory):
+    """A cache built from the fixture server; tests must not modify it"""
+    cache_file = tmp_path_factory.mktemp('cache') / "law_of_one_cache.sqlite3"
+    db = scrape_database(fixture_server, cache_file)
+    db._save_cache()
+    db.http.close()
+    return cache_file
+
+@pytest.fixture
+def database(cache_file):
+    """A database loaded from the shared cache, with the response cache off"""
+    db = LawOfOneDatabase(cache_file=cache_file, load=False, response_cache_size=0)
+    db.load_or_build_database()
+    yield db
+    if db._store is not None:
+        db._store.close()
@@ -0,0 +1,20 @@
+from utils.law_of_one import LawOfOneDatabase
+
+def test_parse_pool_builds_the_same_database(fixture_server, tmp_path):
+    builds = []
+    for parse_workers in (0, 2):
+        db = LawOfOneDatabase(lawofone_url=fixture_server.lawofone_url, llresearch_url=fixture_server.llresearch_url,
+                              parse_workers=parse_workers, requests_per_second=0,
+                              cache_file=tmp_path / f"cache_{parse_workers}.sqlite3", load=False)
+        db._run_build()
+        db.http.close()
+        db._build_index()
+        builds.append(db)
+    in_process, pooled = builds
+
+    assert pooled.build_stats['errors'] == 0
+    assert pooled.sessions == in_process.sessions
+    assert pooled.categories == in_process.categories
+    assert pooled.llresearch_content == in_process.llresearch_content
+    assert pooled.index.fingerprint == in_process.index.fingerprint
+    assert pooled.sessions
@@ -0,0 +1,37 @@
+import threading
+
+from utils.cache_store import load_cache, save_cache
+
+def records(number):
+    return {
+        'sessions': {str(session): {'title': f"Session {session}", 'qa_pairs': []} for session in range(number)},
+        'categories': {'category-0': {'name': "Category", 'questions': []}},
+        'llresearch_content': {}
+    }
+
+def test_concurrent_saves_replace_the_cache_whole(tmp_path):
+    cache_file = tmp_path / "law_of_one_cache.sqlite3"
+    errors = []
+
+    def save(number):
+        try:
+            for _ in range(5):
+                save_cache(cache_file, records(number))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save, args=(number,)) for number in (200, 300)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    data = load_cache(cache_file)
+    try:
+        # One writer's cache, never a mix or a partial file
+        assert len(data['sessions']) in (200, 300)
+        assert list(data['categories']) == ['category-0']
+    finally:
+        data['store'].close()
+    assert [path.name for path in tmp_path.iterdir()] == [cache_file.name]
@@ -0,0 +1,12 @@
+import pytest
+
+from utils.cli import main, verify_cache
+
+def test_verify_passes_on_a_fresh_build(cache_file):
+    problems, _ = verify_cache(cache_file)
+    assert problems == []
+
+@pytest.mark.parametrize('ranking', ['legacy', 'bm25', 'fts5'])
+def test_query_prints_ra_response(cache_file, ranking, capsys):
+    assert main(['--cache-file', str(cache_file), 'query', '--ra', '--ranking', ranking, "What is the veil?"]) == 0
+    assert capsys.readouterr().out.startswith("I am Ra.")
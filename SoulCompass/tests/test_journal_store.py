@@ -0,0 +1,57 @@
+import datetime
+import sqlite3
+
+from utils.journal_store import JournalStore, JOURNAL_SCHEMA_VERSION, SHARED_OWNER
+
+def write_v1_journal(path):
+    """Write a journal in the version 1 layout, before insight provenance and owners"""
+    conn = sqlite3.connect(path)
+    conn.execute("""CREATE TABLE entries (
+        id INTEGER PRIMARY KEY,
+        entry_type TEXT NOT NULL,
+        entry_date TEXT NOT NULL,
+        emotion TEXT,
+        rating INTEGER,
+        description TEXT NOT NULL,
+        insight TEXT,
+        created_at TEXT NOT NULL
+    )""")
+    conn.execute("CREATE INDEX entries_by_date ON entries (entry_date, id)")
+    conn.execute("CREATE INDEX entries_by_type_date ON entries (entry_type, entry_date, id)")
+    conn.executemany(
+        "INSERT INTO entries (entry_type, entry_date, emotion, rating, description, insight, created_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [('Emotion', '2024-01-02', 'Joy', 7, "A bright morning", "Old insight", '2024-01-02T08:00:00'),
+         ('Dream', '2024-01-03', None, 4, "Flying over water", "Old insight", '2024-01-03T07:00:00')]
+    )
+    conn.execute("PRAGMA user_version = 1")
+    conn.commit()
+    conn.close()
+
+def test_v1_journal_is_upgraded(tmp_path):
+    path = tmp_path / "journal.sqlite3"
+    write_v1_journal(path)
+
+    store = JournalStore(path)
+    try:
+        # The old entries keep their data, go to the shared journal, and their insights count as stale
+        entries = store.list_entries(SHARED_OWNER)
+        assert [entry['description'] for entry in entries] == ["Flying over water", "A bright morning"]
+        assert all(entry['insight_version'] is None and entry['insight_ranking'] is None for entry in entries)
+        assert len(store.list_stale_insights('v1', 'legacy')) == 2
+        assert store.count_entries('key:someone-else') == 0
+
+        store.add_entry('key:visitor', 'Synchronicity', datetime.date(2024, 1, 4), "Saw 11:11",
+                        insight="New insight", rating=9, insight_version='v1', insight_ranking='legacy')
+        assert store.count_entries('key:visitor') == 1
+        assert store.count_entries(SHARED_OWNER) == 2
+        assert len(store.list_stale_insights('v1', 'legacy')) == 2
+    finally:
+        store.close()
+
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == JOURNAL_SCHEMA_VERSION
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {'entries_by_owner_date', 'entries_by_owner_type_date'} <= indexes
+    assert not indexes & {'entries_by_date', 'entries_by_type_date'}
+    conn.close()
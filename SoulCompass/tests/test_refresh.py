@@ -0,0 +1,33 @@
+from conftest import scrape_database
+from utils.fixtures import FixtureServer, synthetic_fixtures
+from utils.law_of_one import LawOfOneDatabase
+
+def test_refresh_reparses_only_changed_pages(corpus, tmp_path):
+    fixtures = synthetic_fixtures(corpus)
+    with FixtureServer(fixtures) as server:
+        cache_file = tmp_path / "law_of_one_cache.sqlite3"
+        db = scrape_database(server, cache_file)
+        db._save_cache()
+        db.http.close()
+
+        db = LawOfOneDatabase(lawofone_url=server.lawofone_url, llresearch_url=server.llresearch_url,
+                              parse_workers=0, requests_per_second=0, cache_file=cache_file, load=False)
+        db.load_or_build_database()
+
+        # Every page is unchanged, so each conditional request gets a 304
+        server.reset_stats()
+        assert db.refresh_database() == 0
+        assert db.build_stats['requests'] > 0
+        assert db.build_stats['not_modified'] == db.build_stats['requests']
+        assert server.stats()['not_modified'] == server.stats()['requests']
+
+        # Change one session page: only it is re-parsed, and its new text is searchable
+        session = next(iter(corpus['sessions'].values()))
+        fixtures.add(session['url'], '<html><head><title>Session 1</title></head><body>'
+                     '<div class="q">Questioner: What is the quuxification?</div>'
+                     '<div class="a">Ra: I am Ra. Quuxification is a test.</div></body></html>')
+        assert db.refresh_database() == 1
+        assert db.build_stats['not_modified'] == db.build_stats['requests'] - 1
+        results = db.search("quuxification")
+        assert results and results[0]['question'] == "What is the quuxification?"
+        db.http.close()
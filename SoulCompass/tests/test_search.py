@@ -0,0 +1,62 @@
+import pytest
+
+from utils.law_of_one import RANKING_MODES
+
+def sample_queries(corpus):
+    """Queries of different shapes drawn from the corpus, plus one that matches nothing"""
+    qa_pair = next(iter(corpus['sessions'].values()))['qa_pairs'][0]
+    words = qa_pair['answer'].split()
+    return [
+        words[3],
+        " ".join(words[3:5]),
+        qa_pair['question'][:40],
+        "What is the " + words[-1],
+        "xyzzy plugh"
+    ]
+
+def test_search_matches_a_full_scan(database, corpus, monkeypatch):
+    # The inverted index only narrows down which documents are scored, so the results
+    # must be the same as scoring every document
+    queries = sample_queries(corpus)
+    indexed = [database.search(query, ranking='legacy', limit=10) for query in queries]
+
+    every_document = list(range(len(database.index.documents)))
+    monkeypatch.setattr(database.index, 'candidates', lambda terms, expansions=None: every_document)
+    scanned = [database.search(query, ranking='legacy', limit=10) for query in queries]
+
+    assert indexed == scanned
+    assert any(indexed)
+
+@pytest.mark.parametrize('ranking', RANKING_MODES)
+def test_search_many_matches_search(database, corpus, ranking):
+    if ranking == 'tfidf':
+        pytest.importorskip('scipy')
+    queries = sample_queries(corpus)
+    # Repeated queries get their own (equal) result lists
+    queries.append(queries[0])
+
+    assert database.search_many(queries, k=5, ranking=ranking) == [
+        database.search(query, ranking=ranking, limit=5) for query in queries
+    ]
+
+def test_ra_response_from_a_link_item(database):
+    # L/L Research link items are dicts; the response quotes them by their text
+    result = {
+        'source': 'llresearch.org',
+        'section': 'books',
+        'title': "The Law of One Books",
+        'content': [{'text': "Book One", 'url': "https://www.llresearch.org/book1.pdf", 'content': ""},
+                    "A paragraph about the books."],
+        'relevance': 3,
+        'url': "https://www.llresearch.org/library/the-law-of-one-books/"
+    }
+    response = database._format_ra_response([result])
+    assert "Book One A paragraph about the books." in response
+    assert "[Source: The Law of One Books," in response
+
+@pytest.mark.parametrize('ranking', RANKING_MODES)
+def test_ra_response_in_each_ranking(database, corpus, ranking):
+    if ranking == 'tfidf':
+        pytest.importorskip('scipy')
+    for query in sample_queries(corpus):
+        assert database.get_ra_response(query, ranking=ranking).startswith("I am Ra.")
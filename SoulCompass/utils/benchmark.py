@@ -0,0 +1,435 @@
+"""Offline benchmarks of LawOfOneDatabase on synthetic corpora
+
+Run from the SoulCompass directory, e.g.
+    python -m utils.benchmark --scales 1 10 --output bench.json
+    python -m utils.benchmark --compare before.json after.json
+"""
+import argparse
+import itertools
+import json
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from .fixtures import FixtureServer, synthetic_fixtures
+from .latency import LatencyTracker
+from .law_of_one import LawOfOneDatabase, RANKING_MODES, LAWOFONE_URL, LLRESEARCH_URL, LLRESEARCH_SECTIONS
+from .tfidf import tfidf_available
+
+# Bump this whenever the layout of the results changes
+RESULTS_VERSION = 1
+
+# Corpus sizes, as multiples of the real material (106 sessions of ~18 Q&A pairs,
+# ~40 categories and ~120 paragraphs per L/L Research section)
+SCALES = (1, 10, 100)
+SESSIONS = 106
+QA_PER_SESSION = 18
+CATEGORIES = 40
+ITEMS_PER_SECTION = 120
+
+# Frequent words of the material, at the head of the synthetic vocabulary
+COMMON_WORDS = (
+    "the of and to is a in that this which we you may be one love light creator infinite "
+    "density third fourth harvest service others self meditation catalyst social memory "
+    "complex ra questioner veil mind body spirit polarity wanderer energy center ray "
+    "violet green blue orange yellow red dream emotions synchronicity unity law distortion "
+    "free will"
+).split()
+RARE_WORDS = 8000
+
+def synthetic_vocabulary(seed=0):
+    """Return the vocabulary, most frequent first, and cumulative Zipf weights for it"""
+    rng = random.Random(seed)
+    letters = "aeioubcdfghklmnprstvw"
+    made_up = {"".join(rng.choice(letters) for _ in range(rng.randint(4, 10))) for _ in range(RARE_WORDS)}
+    vocabulary = COMMON_WORDS + sorted(made_up - set(COMMON_WORDS))
+    weights = list(itertools.accumulate(1.0 / rank for rank in range(1, len(vocabulary) + 1)))
+    return vocabulary, weights
+
+def _sentence(rng, vocabulary, weights, words):
+    text = " ".join(rng.choices(vocabulary, cum_weights=weights, k=words))
+    return text[0].upper() + text[1:] + rng.choice(".?")
+
+def synthetic_corpus(scale=1, seed=0):
+    """Return {'sessions', 'categories', 'llresearch_content'} shaped like a real build
+
+    The text is drawn from a Zipf-distributed vocabulary, so term statistics (and search
+    costs) behave like natural language; the same scale and seed give the same corpus.
+    """
+    rng = random.Random(seed)
+    vocabulary, weights = synthetic_vocabulary(seed)
+    lawofone_url = LAWOFONE_URL
+    llresearch_url = LLRESEARCH_URL
+
+    sessions = {}
+    for session in range(1, int(SESSIONS * scale) + 1):
+        session_id = str(session)
+        sessions[session_id] = {
+            'title': f"Session {session_id}",
+            'url': f"{lawofone_url}/s/{session_id}",
+            'qa_pairs': [
+                {
+                    'id': f"{session_id}.{i + 1}",
+                    'question': _sentence(rng, vocabulary, weights, rng.randint(5, 40)),
+                    'answer': "I am Ra. " + _sentence(rng, vocabulary, weights, rng.randint(10, 250))
+                }
+                for i in range(QA_PER_SESSION)
+            ]
+        }
+
+    session_ids = list(sessions)
+    categories = {}
+    for category in range(int(CATEGORIES * scale)):
+        category_id = f"category-{category}"
+        questions = []
+        for _ in range(rng.randint(5, 30)):
+            session_id = rng.choice(session_ids)
+            qa_id = rng.choice(sessions[session_id]['qa_pairs'])['id']
+            questions.append({
+                'id': qa_id,
+                'text': _sentence(rng, vocabulary, weights, rng.randint(5, 20)),
+                'url': f"{lawofone_url}/s/{session_id}#{qa_id}",
+                'session': session_id,
+                'answer': None
+            })
+        categories[category_id] = {
+            'name': category_id.replace('-', ' ').title(),
+            'url': f"{lawofone_url}/c/{category_id}/",
+            'questions': questions
+        }
+
+    # A build keeps one page per L/L Research section; its links are PDFs or pages with a preview
+    llresearch_content = {'library': []}
+    for section_key, section_path in LLRESEARCH_SECTIONS.items():
+        items = []
+        for _ in range(int(ITEMS_PER_SECTION * scale)):
+            if rng.random() < 0.2:
+                if rng.random() < 0.5:
+                    url = f"{llresearch_url}/{section_key}/{len(items)}.pdf"
+                    preview = "PDF Document"
+                else:
+                    url = f"{llresearch_url}/{section_key}/{len(items)}/"
+                    preview = _sentence(rng, vocabulary, weights, rng.randint(20, 80))
+                items.append({
+                    'type': 'link',
+                    'data': {'text': _sentence(rng, vocabulary, weights, rng.randint(2, 8)), 'url': url, 'content': preview}
+                })
+            items.append({'type': 'text', 'data': _sentence(rng, vocabulary, weights, rng.randint(5, 80)), 'tag': 'p'})
+        llresearch_content[section_key] = [{'url': f"{llresearch_url}{section_path}", 'title': section_key, 'content': items}]
+
+    return {'sessions': sessions, 'categories': categories, 'llresearch_content': llresearch_content}
+
+def benchmark_queries(seed=0):
+    """Return the benchmark queries by kind: short, long, common (head terms) and rare (tail terms)"""
+    rng = random.Random(seed + 1)
+    vocabulary, weights = synthetic_vocabulary(seed)
+    tail = vocabulary[len(vocabulary) // 2:]
+    return {
+        'short': ["love", "harvest", "What is the veil?", "meditation", "wanderer"],
+        'long': [_sentence(rng, vocabulary, weights, 30) for _ in range(5)],
+        'common': ["the one", "is of the", "love and light", "that which we", "to be"],
+        'rare': [" ".join(rng.sample(tail, 2)) for _ in range(5)]
+    }
+
+def available_rankings():
+    """Return the ranking modes that can run here ('tfidf' needs numpy and scipy)"""
+    return [ranking for ranking in RANKING_MODES if ranking != 'tfidf' or tfidf_available()]
+
+def _new_database(corpus, cache_file, ranking='legacy'):
+    """A database holding the corpus, without loading or scraping anything"""
+    db = LawOfOneDatabase(ranking=ranking, cache_file=cache_file, load=False, response_cache_size=0)
+    db.sessions = corpus['sessions']
+    db.categories = corpus['categories']
+    db.llresearch_content = corpus['llresearch_content']
+    return db
+
+def _build(corpus, cache_file):
+    """Build path: index the corpus and write the cache store"""
+    db = _new_database(corpus, cache_file)
+    db._build_index()
+    db._save_cache()
+    return db
+
+def _load(cache_file, ranking='legacy'):
+    """Load path: open the database from its cache store"""
+    db = LawOfOneDatabase(ranking=ranking, cache_file=cache_file, load=False, response_cache_size=0)
+    db.load_or_build_database()
+    return db
+
+def _close(db):
+    """Close the cache store a loaded database reads from, so its file can be removed"""
+    if db._store is not None:
+        db._store.close()
+        db._store = None
+
+def _time(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+def _time_load(cache_file):
+    seconds, db = _time(_load, cache_file)
+    _close(db)
+    return seconds
+
+def _summary(samples):
+    """Latency summary (seconds) of a list of timings"""
+    tracker = LatencyTracker(max_samples=len(samples) or 1)
+    for seconds in samples:
+        tracker.record(seconds)
+    summary = tracker.summary()
+    summary['mean'] = sum(samples) / len(samples) if samples else None
+    return summary
+
+def _peak_memory(func, *args):
+    """Peak Python heap allocation (bytes) while func runs"""
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def benchmark_scale(scale, rankings=None, repeat=5, seed=0, workdir=None, scrape=None):
+    """Benchmark one corpus scale; returns a dict of timings (seconds) and peak memory (bytes)
+
+    The response cache is disabled, so every search and get_ra_response call does the full work.
+    get_ra_response calls that raise are counted in ra_response[ranking]['errors'].
+    scrape, if given, holds benchmark_scrape options, and adds its results under 'scrape'.
+    """
+    rankings = list(rankings or available_rankings())
+    corpus = synthetic_corpus(scale, seed)
+    queries = benchmark_queries(seed)
+
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        cache_file = Path(tmp) / "law_of_one_cache.sqlite3"
+
+        build_seconds, db = _time(_build, corpus, cache_file)
+        _close(db)
+        documents = len(db.index.documents)
+        del db
+        result = {
+            'scale': scale,
+            'sessions': len(corpus['sessions']),
+            'documents': documents,
+            'cache_bytes': cache_file.stat().st_size,
+            'build_seconds': build_seconds,
+            'load_seconds': _summary([_time_load(cache_file) for _ in range(repeat)]),
+            'search': {},
+            'ra_response': {}
+        }
+
+        _benchmark_rankings(result, cache_file, rankings, queries, repeat)
+
+        # Measured separately, since tracing slows the code down
+        build_file = Path(tmp) / "peak_build.sqlite3"
+        result['peak_memory'] = {
+            'build': _peak_memory(lambda: _close(_build(corpus, build_file))),
+            'load': _peak_memory(lambda: _close(_load(cache_file)))
+        }
+
+        if scrape is not None:
+            result['scrape'] = benchmark_scrape(corpus, workdir=tmp, **scrape)
+
+    return result
+
+def _benchmark_rankings(result, cache_file, rankings, queries, repeat):
+    """Time search and get_ra_response on a cache file for each ranking, into result['search'/'ra_response']"""
+    for ranking in rankings:
+        db = _load(cache_file, ranking)
+        # Untimed first call, so one-off setup (e.g. the TF-IDF matrix) isn't counted
+        db.search("love")
+
+        result['search'][ranking] = {}
+        for kind, kind_queries in queries.items():
+            result['search'][ranking][kind] = _summary([
+                _time(db.search, query)[0] for _ in range(repeat) for query in kind_queries
+            ])
+
+        samples = []
+        errors = 0
+        for _ in range(repeat):
+            for query in itertools.chain.from_iterable(queries.values()):
+                try:
+                    samples.append(_time(db.get_ra_response, query)[0])
+                except Exception:
+                    errors += 1
+        result['ra_response'][ranking] = _summary(samples)
+        result['ra_response'][ranking]['errors'] = errors
+        _close(db)
+
+def benchmark_cache(cache_file, rankings=None, repeat=5, seed=0):
+    """Benchmark loading and querying an existing cache file (e.g. a real build), like benchmark_scale
+
+    The cache file is only read. Returns the results in the same layout as run_benchmarks,
+    with one entry under 'caches', so they can be compared the same way.
+    """
+    cache_file = Path(cache_file)
+    db = _load(cache_file)
+    # By default, only the modes this cache supports ('fts5' needs the full-text index)
+    has_fts = db._store is not None and db._store.has_fts()
+    rankings = list(rankings or [ranking for ranking in available_rankings() if ranking != 'fts5' or has_fts])
+    _close(db)
+    result = {
+        'cache_file': str(cache_file),
+        'sessions': len(db.sessions),
+        'documents': len(db.index.documents),
+        'cache_bytes': cache_file.stat().st_size,
+        'load_seconds': _summary([_time_load(cache_file) for _ in range(repeat)]),
+        'search': {},
+        'ra_response': {}
+    }
+    del db
+    _benchmark_rankings(result, cache_file, rankings, benchmark_queries(seed), repeat)
+    result['peak_memory'] = {'load': _peak_memory(lambda: _close(_load(cache_file)))}
+    return dict(_results_header(repeat, seed), caches=[result])
+
+def benchmark_scrape(corpus, concurrency=(1, 4, 8), latency=0.02, error_rate=0.0, parse_workers=0, seed=0, workdir=None):
+    """Time scraping the corpus from a local FixtureServer, once per concurrency level
+
+    The server adds latency seconds to each response and fails error_rate of the requests
+    (the same ones on every run); the client's rate limit is off. Each build is followed by
+    a refresh, which gets a 304 for every page. Returns {f"concurrency_{n}": timings}.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp, \
+            FixtureServer(synthetic_fixtures(corpus), latency=latency, error_rate=error_rate, seed=seed) as server:
+        for workers in concurrency:
+            server.reset_stats()
+            db = LawOfOneDatabase(concurrency=workers, requests_per_second=0, parse_workers=parse_workers,
+                                  cache_file=Path(tmp) / f"scrape_{workers}.sqlite3", load=False,
+                                  lawofone_url=server.lawofone_url, llresearch_url=server.llresearch_url)
+            db._run_build()
+            build_stats = db.build_stats
+            db._run_build(conditional=True)
+            db.http.close()
+            results[f"concurrency_{workers}"] = {
+                'build_seconds': build_stats['build_seconds'],
+                'pages_per_second': build_stats['requests'] / build_stats['build_seconds'],
+                'requests': build_stats['requests'],
+                'retries': build_stats['retries'],
+                'errors': build_stats['errors'],
+                'bytes': build_stats['bytes'],
+                'sessions': len(db.sessions),
+                'refresh_seconds': db.build_stats['build_seconds']
+            }
+    return results
+
+def run_benchmarks(scales=SCALES, rankings=None, repeat=5, seed=0, workdir=None, scrape=None):
+    """Benchmark each scale in turn; returns the machine-readable results"""
+    results = dict(_results_header(repeat, seed), scrape=scrape, scales=[])
+    for scale in scales:
+        print(f"Benchmarking scale {scale}x...")
+        results['scales'].append(benchmark_scale(scale, rankings, repeat, seed, workdir, scrape))
+    return results
+
+def _results_header(repeat, seed):
+    """Where and how a benchmark ran, at the top of its results"""
+    return {
+        'version': RESULTS_VERSION,
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'started': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'repeat': repeat,
+        'seed': seed
+    }
+
+def _git_commit():
+    """The checked-out commit, or None outside a git checkout"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def flatten_results(results):
+    """Return {metric path: value} for every number in the results, e.g. 'scale_10x.search.bm25.rare.p50'"""
+    metrics = {}
+
+    def walk(prefix, value):
+        if isinstance(value, dict):
+            for key, child in value.items():
+                walk(f"{prefix}.{key}", child)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics[prefix] = value
+
+    for scale_result in results.get('scales', []):
+        walk(f"scale_{scale_result['scale']}x", {k: v for k, v in scale_result.items() if k != 'scale'})
+    for cache_result in results.get('caches', []):
+        walk("cache", cache_result)
+    return metrics
+
+def compare_results(before, after):
+    """Return (metric, before, after, after / before) for the metrics both runs have"""
+    before_metrics = flatten_results(before)
+    after_metrics = flatten_results(after)
+    return [
+        (metric, before_metrics[metric], value, value / before_metrics[metric] if before_metrics[metric] else None)
+        for metric, value in after_metrics.items() if metric in before_metrics
+    ]
+
+def _print_rankings(result):
+    for ranking, kinds in result['search'].items():
+        timings = ", ".join(f"{kind} {summary['p50'] * 1000:.2f}ms" for kind, summary in kinds.items())
+        ra_response = result['ra_response'][ranking]
+        errors = f" ({ra_response['errors']} failed)" if ra_response['errors'] else ""
+        print(f"  {ranking}: search p50 {timings}; ra_response p50 {ra_response['p50'] * 1000:.2f}ms{errors}")
+
+def print_results(results):
+    for cache_result in results.get('caches', []):
+        print(f"\n{cache_result['cache_file']}: {cache_result['sessions']} sessions, {cache_result['documents']} documents, "
+              f"{cache_result['cache_bytes'] / 1e6:.1f} MB")
+        print(f"  load p50 {cache_result['load_seconds']['p50'] * 1000:.1f}ms, peak memory {cache_result['peak_memory']['load'] / 1e6:.1f} MB")
+        _print_rankings(cache_result)
+    for scale_result in results.get('scales', []):
+        print(f"\n{scale_result['scale']}x: {scale_result['sessions']} sessions, {scale_result['documents']} documents, "
+              f"{scale_result['cache_bytes'] / 1e6:.1f} MB cache")
+        print(f"  build {scale_result['build_seconds']:.2f}s, load p50 {scale_result['load_seconds']['p50'] * 1000:.1f}ms, "
+              f"peak memory build {scale_result['peak_memory']['build'] / 1e6:.1f} MB / load {scale_result['peak_memory']['load'] / 1e6:.1f} MB")
+        _print_rankings(scale_result)
+        for mode, scrape in scale_result.get('scrape', {}).items():
+            print(f"  scrape {mode}: build {scrape['build_seconds']:.2f}s ({scrape['pages_per_second']:.0f} pages/s, "
+                  f"{scrape['retries']} retries, {scrape['errors']} errors), refresh {scrape['refresh_seconds']:.2f}s")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark LawOfOneDatabase on synthetic corpora (no network access)")
+    parser.add_argument('--scales', type=float, nargs='+', default=list(SCALES), help="corpus sizes relative to the real material")
+    parser.add_argument('--rankings', nargs='+', choices=RANKING_MODES, help="ranking modes to time (default: all available)")
+    parser.add_argument('--repeat', type=int, default=5, help="timed runs of each operation")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--scrape', action='store_true', help="also time scraping the corpus from a local fixture server")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 8], help="scraping workers to time with --scrape")
+    parser.add_argument('--latency', type=float, default=0.02, help="fixture server response latency (seconds)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of fixture server requests that fail")
+    parser.add_argument('--parse-workers', type=int, default=0, help="HTML parsing processes (0 parses in the scraping threads)")
+    parser.add_argument('--output', help="write the results as JSON to this file")
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help="compare two results files instead of running")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        before, after = (json.loads(Path(path).read_text()) for path in args.compare)
+        print(f"{'metric':60} {'before':>12} {'after':>12} {'ratio':>7}")
+        for metric, old, new, ratio in compare_results(before, after):
+            print(f"{metric:60} {old:12.6g} {new:12.6g} {ratio:7.2f}" if ratio is not None else f"{metric:60} {old:12.6g} {new:12.6g}")
+        return 0
+
+    scales = [int(scale) if scale == int(scale) else scale for scale in args.scales]
+    scrape = None
+    if args.scrape:
+        scrape = {'concurrency': args.concurrency, 'latency': args.latency, 'error_rate': args.error_rate,
+                  'parse_workers': args.parse_workers, 'seed': args.seed}
+    results = run_benchmarks(scales, args.rankings, args.repeat, args.seed, scrape=scrape)
+    print_results(results)
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+        print(f"\nResults written to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,298 @@
+import json
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from pathlib import Path
+
+# Bump this whenever the store layout changes; it lives in the SQLite header
+# (PRAGMA user_version) so stale files are detected without opening them
+STORE_SCHEMA_VERSION = 2
+
+# Let SQLite memory-map up to this much of the file, so the pages are shared
+# between processes through the OS page cache instead of copied into each heap
+MMAP_SIZE = 256 * 1024 * 1024
+
+# Record kinds kept in the store, in the order they are written
+RECORD_KINDS = ('sessions', 'categories', 'llresearch_content')
+
+SQLITE_MAGIC = b"SQLite format 3\x00"
+
+def read_schema_version(path):
+    """Return the schema version from a store's file header, or None if it isn't a store"""
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(100)
+    except OSError:
+        return None
+
+    if len(header) < 100 or not header.startswith(SQLITE_MAGIC):
+        return None
+    return int.from_bytes(header[60:64], 'big')
+
+def is_pickle_cache(path):
+    """Return True if the cache path uses the legacy pickle format"""
+    return Path(path).suffix == '.pkl'
+
+def load_cache(path, records_cached=128):
+    """Load a cache file; returns the data dict, or None if the file is missing or stale
+
+    Pickle caches are loaded whole. SQLite stores return lazy, read-only mappings for
+    the record kinds, keeping at most records_cached decoded records of each kind.
+    """
+    path = Path(path)
+    if not path.exists():
+        return None
+
+    if is_pickle_cache(path):
+        with open(path, 'rb') as f:
+            data = pickle.load(f)
+        if data.get('index') is not None:
+            data['index'].texts = data.get('texts')
+        return data
+
+    version = read_schema_version(path)
+    if version != STORE_SCHEMA_VERSION:
+        print(f"Ignoring cache {path}: schema version {version}, expected {STORE_SCHEMA_VERSION}")
+        return None
+
+    store = SqliteStore(path)
+    data = {kind: LazyRecords(store, kind, records_cached) for kind in RECORD_KINDS}
+    data['index'] = store.get_blob('index', pickle.loads)
+    if data['index'] is not None:
+        # Read per query from the documents table (None if the store predates it)
+        data['index'].texts = DocumentTexts(store) if store.has_documents() else None
+    data['validators'] = store.get_blob('validators', json.loads) or {}
+    data['store'] = store
+    return data
+
+def save_cache(path, data):
+    """Write a cache file atomically (readers of the old file are unaffected)"""
+    path = Path(path)
+    # A temporary file of its own, so writers in other processes can't clobber it
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name + '.', suffix='.tmp')
+    try:
+        # mkstemp makes the file private, but the cache is shared with other users' processes
+        os.chmod(tmp_path, 0o644)
+        if is_pickle_cache(path):
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump({key: data.get(key) for key in RECORD_KINDS + ('index', 'validators', 'texts')}, f)
+        else:
+            os.close(fd)
+            _write_sqlite(tmp_path, data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def _write_sqlite(path, data):
+    """Write the data dict to a new SQLite store"""
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value BLOB)")
+        conn.execute("""CREATE TABLE records (
+            kind TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            key TEXT NOT NULL,
+            data TEXT NOT NULL,
+            PRIMARY KEY (kind, key)
+        ) WITHOUT ROWID""")
+
+        for kind in RECORD_KINDS:
+            conn.executemany(
+                "INSERT INTO records (kind, position, key, data) VALUES (?, ?, ?, ?)",
+                ((kind, position, key, json.dumps(value)) for position, (key, value) in enumerate(data.get(kind, {}).items()))
+            )
+
+        if data.get('index') is not None:
+            conn.execute("INSERT INTO meta VALUES ('index', ?)", (pickle.dumps(data['index'], protocol=pickle.HIGHEST_PROTOCOL),))
+        conn.execute("INSERT INTO meta VALUES ('validators', ?)", (json.dumps(data.get('validators') or {}),))
+
+        if data.get('texts') is not None:
+            # The normalized text of each indexed document, read by the legacy ranking for
+            # its candidates only (question is NULL for L/L Research items)
+            conn.execute("CREATE TABLE documents (doc_id INTEGER PRIMARY KEY, question TEXT, body TEXT NOT NULL)")
+            conn.executemany(
+                "INSERT INTO documents VALUES (?, ?, ?)",
+                ((doc_id, None, text) if isinstance(text, str) else (doc_id, *text) for doc_id, text in enumerate(data['texts']))
+            )
+
+            # Full-text index over the same texts (rowid = doc_id). It only ranks rowids,
+            # so it is contentless rather than keeping another copy of the text
+            try:
+                conn.execute("CREATE VIRTUAL TABLE documents_fts USING fts5(text, content = '', tokenize = 'porter unicode61')")
+            except sqlite3.OperationalError as e:
+                print(f"SQLite FTS5 is unavailable, skipping the full-text index: {e}")
+            else:
+                conn.executemany("INSERT INTO documents_fts (rowid, text) VALUES (?, ?)",
+                                 ((doc_id, text if isinstance(text, str) else " ".join(text)) for doc_id, text in enumerate(data['texts'])))
+                conn.execute("INSERT INTO documents_fts (documents_fts) VALUES ('optimize')")
+
+        # Written last, so a half-written file never carries a valid version
+        conn.execute(f"PRAGMA user_version = {STORE_SCHEMA_VERSION}")
+        conn.commit()
+    finally:
+        conn.close()
+
+class SqliteStore:
+    """Read-only, memory-mapped connection to a SQLite cache store"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        # Streamlit serves each session from its own thread, so share one guarded connection
+        self._conn = sqlite3.connect(f"{self.path.resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False)
+        self._conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+
+    def keys(self, kind):
+        """Return the record keys of a kind, in their original order"""
+        with self._lock:
+            rows = self._conn.execute("SELECT key FROM records WHERE kind = ? ORDER BY position", (kind,)).fetchall()
+        return [row[0] for row in rows]
+
+    def get(self, kind, key):
+        """Return the decoded record, or raise KeyError"""
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM records WHERE kind = ? AND key = ?", (kind, key)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return json.loads(row[0])
+
+    def get_blob(self, key, decode):
+        """Return a decoded meta value, or None if it is missing"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return decode(row[0]) if row is not None else None
+
+    def has_fts(self):
+        """Return True if the store has the FTS5 full-text index"""
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'documents_fts'").fetchone()
+        return row is not None
+
+    def has_documents(self):
+        """Return True if the store has the table of normalized document texts"""
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'documents'").fetchone()
+        return row is not None
+
+    def count_documents(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def get_documents(self, doc_ids):
+        """Return {doc_id: (question, body)} for the given documents"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT doc_id, question, body FROM documents WHERE doc_id IN (SELECT value FROM json_each(?))",
+                (json.dumps(list(doc_ids)),)
+            ).fetchall()
+        return {doc_id: (question, body) for doc_id, question, body in rows}
+
+    def iter_documents(self, batch_size=1000):
+        """Yield (question, body) for every document, in doc_id order"""
+        last_id = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT doc_id, question, body FROM documents WHERE doc_id > ? ORDER BY doc_id LIMIT ?",
+                    (last_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for _, question, body in rows:
+                yield question, body
+            last_id = rows[-1][0]
+
+    def integrity_check(self):
+        """Run SQLite's integrity check; returns the problems found (empty if the file is sound)"""
+        with self._lock:
+            rows = self._conn.execute("PRAGMA integrity_check").fetchall()
+        return [row[0] for row in rows if row[0] != 'ok']
+
+    def search_fts(self, match, limit, offset=0):
+        """Run an FTS5 MATCH query; returns (doc_id, relevance) pairs, best first
+
+        SQLite's bm25() is lower-is-better, so it is negated into a relevance.
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT rowid, -bm25(documents_fts) FROM documents_fts WHERE documents_fts MATCH ? "
+                "ORDER BY bm25(documents_fts) LIMIT ? OFFSET ?",
+                (match, limit, offset)
+            ).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class DocumentTexts:
+    """Read-only view of the normalized document texts in a SqliteStore, for InvertedIndex.texts
+
+    Texts come back as InvertedIndex.build made them: a (question, answer) tuple for
+    Q&A pairs and a string for L/L Research items.
+    """
+
+    def __init__(self, store):
+        self._store = store
+
+    def __len__(self):
+        return self._store.count_documents()
+
+    def __getitem__(self, doc_id):
+        return self.get_many([doc_id])[0]
+
+    def get_many(self, doc_ids):
+        """Return the texts of the given documents, in order (one query for all of them)"""
+        rows = self._store.get_documents(doc_ids)
+        return [_document_text(*rows[doc_id]) for doc_id in doc_ids]
+
+    def iter_all(self):
+        """Yield every text in doc_id order"""
+        return (_document_text(question, body) for question, body in self._store.iter_documents())
+
+def _document_text(question, body):
+    return body if question is None else (question, body)
+
+class LazyRecords(Mapping):
+    """Read-only mapping that decodes records from a SqliteStore on first access"""
+
+    def __init__(self, store, kind, max_cached=128):
+        self._store = store
+        self._kind = kind
+        self._keys = store.keys(kind)
+        self._key_set = set(self._keys)
+        self._max_cached = max_cached
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getitem__(self, key):
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        if key not in self._key_set:
+            raise KeyError(key)
+        value = self._store.get(self._kind, key)
+
+        # Keep only the most recently used records decoded
+        with self._lock:
+            self._cache[key] = value
+            if len(self._cache) > self._max_cached:
+                self._cache.popitem(last=False)
+        return value
+
+    def __contains__(self, key):
+        return key in self._key_set
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
@@ -0,0 +1,310 @@
+"""Command-line tool to build, refresh, check and query the Law of One cache without Streamlit
+
+Run from the SoulCompass directory, e.g. to prebuild the cache in a deploy pipeline:
+    python -m utils.cli build --concurrency 8 --rate 4
+    python -m utils.cli verify
+    python -m utils.cli query "What is the veil?" --ranking bm25
+"""
+import argparse
+import io
+import json
+import os
+import sys
+from contextlib import redirect_stdout
+from pathlib import Path
+
+from .benchmark import available_rankings, benchmark_cache, print_results
+from .cache_store import load_cache, read_schema_version, is_pickle_cache, STORE_SCHEMA_VERSION
+from .law_of_one import (
+    LawOfOneDatabase, CACHE_FILE, LAWOFONE_URL, LLRESEARCH_URL, RANKING_MODES,
+    DEFAULT_CONCURRENCY, DEFAULT_REQUESTS_PER_SECOND
+)
+from .search_index import InvertedIndex, INDEX_VERSION
+
+# Query searched and answered in every ranking mode by verify
+VERIFY_QUERY = "love"
+
+def cache_stats(cache_file):
+    """Return the sizes of a cache file's contents, or None if there is no usable cache"""
+    cache_file = Path(cache_file)
+    data = load_cache(cache_file)
+    if data is None:
+        return None
+    try:
+        sessions = data['sessions']
+        llresearch_content = data['llresearch_content']
+        index = data['index']
+        store = data.get('store')
+        return {
+            'cache_file': str(cache_file),
+            'cache_bytes': cache_file.stat().st_size,
+            'schema_version': None if is_pickle_cache(cache_file) else read_schema_version(cache_file),
+            'index_version': getattr(index, 'version', None),
+            'corpus_version': f"{index.version}-{index.fingerprint[:16]}" if getattr(index, 'fingerprint', None) else None,
+            'sessions': len(sessions),
+            'qa_pairs': sum(len(session['qa_pairs']) for session in sessions.values()),
+            'categories': len(data['categories']),
+            'category_questions': sum(len(category.get('questions', [])) for category in data['categories'].values()),
+            'llresearch_sections': len(llresearch_content),
+            'llresearch_items': sum(len(page.get('content', [])) for pages in llresearch_content.values() for page in pages),
+            'documents': len(index.documents) if index is not None else 0,
+            'terms': len(index.postings) if index is not None else 0,
+            'validators': len(data.get('validators') or {}),
+            'full_text_index': store.has_fts() if store is not None else False
+        }
+    finally:
+        if data.get('store') is not None:
+            data['store'].close()
+
+def verify_cache(cache_file, rankings=None):
+    """Check that a cache file is complete and consistent; returns (problems, warnings) as lists of messages
+
+    Checks the schema and index versions, SQLite integrity, that every indexed document
+    resolves to a record and the index matches the records, and runs a query (and builds Ra's
+    response to it) in each ranking mode the cache supports ('fts5' needs a SQLite store with
+    the full-text index).
+    """
+    cache_file = Path(cache_file)
+    problems = []
+    warnings = []
+    if not cache_file.exists():
+        return [f"{cache_file} does not exist"], warnings
+
+    if not is_pickle_cache(cache_file):
+        version = read_schema_version(cache_file)
+        if version != STORE_SCHEMA_VERSION:
+            return [f"schema version {version}, expected {STORE_SCHEMA_VERSION}"], warnings
+
+    try:
+        data = load_cache(cache_file)
+    except Exception as e:
+        return [f"cannot be loaded: {e}"], warnings
+
+    store = data.get('store')
+    has_fts = store is not None and store.has_fts()
+    if not has_fts:
+        warnings.append("no full-text index, so the fts5 ranking can't be used with this cache")
+    try:
+        if store is not None:
+            problems.extend(f"integrity check: {message}" for message in store.integrity_check())
+
+        sessions = data['sessions']
+        categories = data['categories']
+        llresearch_content = data['llresearch_content']
+        index = data['index']
+        if not sessions:
+            problems.append("no sessions")
+        if not categories:
+            problems.append("no categories")
+        if not llresearch_content:
+            warnings.append("no L/L Research content")
+        if index is None:
+            problems.append("no search index")
+        elif getattr(index, 'version', None) != INDEX_VERSION:
+            problems.append(f"index version {getattr(index, 'version', None)}, expected {INDEX_VERSION}")
+        elif index.texts is None:
+            problems.append("no document texts")
+        elif len(index.texts) != len(index.documents):
+            problems.append(f"{len(index.texts)} document texts for {len(index.documents)} indexed documents")
+        elif sessions:
+            problems.extend(_check_documents(index, sessions, llresearch_content))
+            rebuilt = InvertedIndex.build(sessions, llresearch_content)
+            if rebuilt.fingerprint != index.fingerprint:
+                problems.append("the search index does not match the records")
+    except Exception as e:
+        problems.append(f"cannot be read: {e}")
+    finally:
+        if store is not None:
+            store.close()
+
+    # Only query a sound cache, since loading a stale one would rebuild it
+    if not problems:
+        for ranking in rankings or available_rankings():
+            if ranking == 'fts5' and not has_fts:
+                continue
+            db = LawOfOneDatabase(ranking=ranking, cache_file=cache_file, load=False, response_cache_size=0)
+            with redirect_stdout(io.StringIO()):
+                db.load_or_build_database()
+            try:
+                if not db.search(VERIFY_QUERY):
+                    warnings.append(f"{ranking} search for {VERIFY_QUERY!r} found nothing")
+            except Exception as e:
+                problems.append(f"{ranking} search failed: {e}")
+            try:
+                db.get_ra_response(VERIFY_QUERY)
+            except Exception as e:
+                problems.append(f"{ranking} Ra response failed: {e}")
+            finally:
+                if db._store is not None:
+                    db._store.close()
+    return problems, warnings
+
+def _check_documents(index, sessions, llresearch_content):
+    """Return a problem for each indexed document that doesn't resolve to a record (at most a few)"""
+    problems = []
+    for doc_id, ref in enumerate(index.documents):
+        try:
+            if ref[0] == 'qa':
+                sessions[ref[1]]['qa_pairs'][ref[2]]
+            else:
+                llresearch_content[ref[1]][ref[2]]['content'][ref[3]]
+        except (KeyError, IndexError):
+            problems.append(f"indexed document {doc_id} {ref} has no record")
+            if len(problems) == 5:
+                problems.append("...")
+                break
+    return problems
+
+def _database(args):
+    """A database for the scraping options of the build and refresh commands, not yet loaded"""
+    return LawOfOneDatabase(cache_file=args.cache_file, concurrency=args.concurrency, requests_per_second=args.rate,
+                            parse_workers=args.parse_workers, lawofone_url=args.lawofone_url,
+                            llresearch_url=args.llresearch_url, load=False)
+
+def _usable_cache(cache_file):
+    """Return True if the cache file holds a database; otherwise says so"""
+    stats = cache_stats(cache_file)
+    if stats is None or not stats['sessions'] or not stats['categories']:
+        print(f"No usable cache at {cache_file}; run the build command first")
+        return False
+    return True
+
+def _report_verify(cache_file):
+    problems, warnings = verify_cache(cache_file)
+    for message in warnings:
+        print(f"Warning: {message}")
+    for message in problems:
+        print(f"Problem: {message}")
+    print(f"{cache_file}: {'FAILED' if problems else 'OK'}")
+    return 1 if problems else 0
+
+def _print_build_stats(db):
+    stats = db.build_stats
+    print(f"{stats['requests']} requests, {stats['retries']} retries, {stats['errors']} errors, "
+          f"{stats['not_modified']} not modified, {stats['bytes'] / 1e6:.1f} MB in {stats['build_seconds']:.1f}s")
+
+def build_command(args):
+    db = _database(args)
+    print(f"Building the Law of One database into {args.cache_file}...")
+    db._run_build()
+    _print_build_stats(db)
+
+    # Leave the previous cache in place rather than ship a broken or partial one
+    if not db.sessions or not db.categories:
+        print(f"The build fetched {len(db.sessions)} sessions and {len(db.categories)} categories; not saving it")
+        return 1
+    if args.max_errors is not None and db.build_stats['errors'] > args.max_errors:
+        print(f"{db.build_stats['errors']} requests failed (more than --max-errors {args.max_errors}); not saving the build")
+        return 1
+
+    db._build_index()
+    db._save_cache()
+    return _report_verify(args.cache_file)
+
+def refresh_command(args):
+    if not _usable_cache(args.cache_file):
+        return 1
+    db = _database(args)
+    db.load_or_build_database()
+    db.refresh_database()
+    _print_build_stats(db)
+    return _report_verify(args.cache_file)
+
+def verify_command(args):
+    return _report_verify(args.cache_file)
+
+def stats_command(args):
+    stats = cache_stats(args.cache_file)
+    if stats is None:
+        print(f"No usable cache at {args.cache_file}")
+        return 1
+    if args.json:
+        print(json.dumps(stats, indent=2))
+    else:
+        for key, value in stats.items():
+            print(f"{key:20} {value}")
+    return 0
+
+def query_command(args):
+    if not _usable_cache(args.cache_file):
+        return 1
+    db = LawOfOneDatabase(ranking=args.ranking, cache_file=args.cache_file, load=False)
+    # Keep stdout to the results, e.g. for --json
+    with redirect_stdout(sys.stderr):
+        db.load_or_build_database()
+    query = " ".join(args.query)
+
+    if args.ra:
+        print(db.get_ra_response(query))
+        return 0
+
+    results = db.search(query, limit=args.limit)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+    if not results:
+        print("No results")
+    for rank, result in enumerate(results, 1):
+        if result['source'] == 'lawofone.info':
+            print(f"{rank}. [{result['relevance']:.3g}] {result['url']}\n   Q: {result['question']}\n   A: {result['answer'][:300]}")
+        else:
+            print(f"{rank}. [{result['relevance']:.3g}] {result['title']} ({result['url']})")
+    return 0
+
+def bench_command(args):
+    if not _usable_cache(args.cache_file):
+        return 1
+    results = benchmark_cache(args.cache_file, args.rankings, args.repeat, args.seed)
+    print_results(results)
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+        print(f"\nResults written to {args.output}")
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build, refresh, check and query the Law of One database cache")
+    parser.add_argument('--cache-file', type=Path, default=CACHE_FILE, help=f"cache file (default: {CACHE_FILE})")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build = subparsers.add_parser('build', help="scrape the websites and write a new cache")
+    refresh = subparsers.add_parser('refresh', help="re-fetch the cached pages, re-parsing only those that changed")
+    for subparser in (build, refresh):
+        subparser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help="scraping threads")
+        subparser.add_argument('--rate', type=float, default=DEFAULT_REQUESTS_PER_SECOND, help="requests per second (0 for no limit)")
+        subparser.add_argument('--parse-workers', type=int, default=os.cpu_count() or 1,
+                               help="HTML parsing processes (default: one per core; 0 parses in the scraping threads)")
+        subparser.add_argument('--lawofone-url', default=LAWOFONE_URL)
+        subparser.add_argument('--llresearch-url', default=LLRESEARCH_URL)
+    build.add_argument('--max-errors', type=int, help="don't save the build if more requests than this failed")
+
+    subparsers.add_parser('verify', help="check the cache is complete and consistent (exit status 1 if not)")
+
+    stats = subparsers.add_parser('stats', help="show what the cache holds")
+    stats.add_argument('--json', action='store_true')
+
+    query = subparsers.add_parser('query', help="search the cache")
+    query.add_argument('query', nargs='+')
+    query.add_argument('--ranking', choices=RANKING_MODES, default='legacy')
+    query.add_argument('--limit', type=int, default=5)
+    query.add_argument('--ra', action='store_true', help="print Ra's response instead of the search results")
+    query.add_argument('--json', action='store_true')
+
+    bench = subparsers.add_parser('bench', help="time loading and querying the cache (see utils.benchmark for synthetic corpora)")
+    bench.add_argument('--rankings', nargs='+', choices=RANKING_MODES, help="ranking modes to time (default: all available)")
+    bench.add_argument('--repeat', type=int, default=5, help="timed runs of each operation")
+    bench.add_argument('--seed', type=int, default=0)
+    bench.add_argument('--output', help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    commands = {
+        'build': build_command,
+        'refresh': refresh_command,
+        'verify': verify_command,
+        'stats': stats_command,
+        'query': query_command,
+        'bench': bench_command
+    }
+    return commands[args.command](args)
+
+if __name__ == "__main__":
+    sys.exit(main())
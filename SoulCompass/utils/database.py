@@ -0,0 +1,126 @@
+import os
+import re
+import secrets
+import threading
+
+import streamlit as st
+
+from .law_of_one import LawOfOneDatabase
+from .journal_store import JournalStore, SHARED_OWNER
+from .insights import InsightRefreshJob
+from .metrics import metrics, METRICS_PORT, start_metrics_server
+
+class DatabaseLoader:
+    """Loads (or builds) the LawOfOneDatabase on a background thread
+
+    Pages render straight away and check is_ready() before searching; until then
+    get_progress() reports what the load is doing.
+    """
+
+    def __init__(self):
+        self.db = LawOfOneDatabase(load=False)
+        self.error = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._load, name="law-of-one-loader", daemon=True)
+        self._thread.start()
+
+    def _load(self):
+        try:
+            self.db.load_or_build_database()
+        except Exception as e:
+            print(f"Error loading Law of One database: {e}")
+            self.error = str(e)
+        finally:
+            self._ready.set()
+
+    def is_ready(self):
+        """Return True once the database has finished loading successfully"""
+        return self._ready.is_set() and self.error is None
+
+    def wait(self, timeout=None):
+        """Block until loading has finished (or the timeout expires); returns is_ready()"""
+        self._ready.wait(timeout)
+        return self.is_ready()
+
+    def get_progress(self):
+        """Return the database's progress snapshot (stage, sessions_fetched, sessions_total)"""
+        return self.db.get_progress()
+
+# Every page gets the database from here, so a server process holds (and loads)
+# exactly one copy of the corpus no matter which pages have been visited
+@st.cache_resource(show_spinner=False)
+def get_law_of_one_loader():
+    """Return the process-wide DatabaseLoader, starting the load on first use"""
+    get_metrics_server()
+    return DatabaseLoader()
+
+@st.cache_resource(show_spinner=False)
+def get_metrics_server():
+    """Serve /metrics on SOULCOMPASS_METRICS_PORT if metrics are enabled and the port is set; returns the server or None"""
+    if not (metrics.enabled and METRICS_PORT):
+        return None
+    return start_metrics_server(METRICS_PORT)
+
+@st.cache_resource(show_spinner=False)
+def get_journal_store():
+    """Return the process-wide JournalStore"""
+    return JournalStore()
+
+# Everyone shares one journal with SOULCOMPASS_SHARED_JOURNAL=1 (for single-user deployments)
+SHARED_JOURNAL = os.environ.get("SOULCOMPASS_SHARED_JOURNAL", "") == "1"
+
+# Private journal keys, as made by secrets.token_urlsafe(16)
+JOURNAL_KEY_PATTERN = re.compile(r"[A-Za-z0-9_-]{22,64}")
+
+def get_journal_owner():
+    """Return the owner id this visitor's journal entries are saved under
+
+    Signed-in users (when the app has authentication set up) own their journal across
+    browsers. Anyone else gets a random private key, kept in the page URL (?journal=...)
+    so that reloading or bookmarking the page returns to the same journal.
+    """
+    if SHARED_JOURNAL:
+        return SHARED_OWNER
+    if st.user.get('is_logged_in'):
+        return f"user:{st.user.get('sub') or st.user.get('email')}"
+
+    key = st.query_params.get('journal')
+    if not (key and JOURNAL_KEY_PATTERN.fullmatch(key)):
+        key = st.session_state.get('journal_key') or secrets.token_urlsafe(16)
+    st.session_state.journal_key = key
+    if st.query_params.get('journal') != key:
+        st.query_params['journal'] = key
+    return f"key:{key}"
+
+@st.cache_resource(show_spinner=False)
+def start_insight_refresh(corpus_version, ranking):
+    """Start regenerating stale journal insights in the background
+
+    Cached on its arguments, so the job runs once per corpus version and ranking mode.
+    """
+    job = InsightRefreshJob(get_law_of_one_db(), get_journal_store())
+    job.start()
+    return job
+
+def get_law_of_one_db():
+    """Return the shared LawOfOneDatabase if it has finished loading, otherwise None"""
+    loader = get_law_of_one_loader()
+    return loader.db if loader.is_ready() else None
+
+@st.fragment(run_every=2)
+def show_load_progress():
+    """Show how far the database load has got, rerunning the page once it is ready"""
+    loader = get_law_of_one_loader()
+    if loader.is_ready():
+        st.rerun()
+    if loader.error:
+        st.warning(f"The Law of One database could not be loaded: {loader.error}")
+        return
+
+    progress = loader.get_progress()
+    if progress['sessions_total']:
+        fetched = progress['sessions_fetched']
+        total = progress['sessions_total']
+        st.progress(fetched / total, text=f"Building the Law of One database ({progress['stage']}): {fetched} / {total} sessions fetched")
+    else:
+        st.info(f"Preparing the Law of One database ({progress['stage']})...")
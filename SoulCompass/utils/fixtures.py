@@ -0,0 +1,330 @@
+"""Recorded pages of the Law of One websites, and a local server standing in for them
+
+A FixtureSet holds captured responses by URL. It can be recorded from a live build,
+synthesized from a corpus, and saved as a directory. FixtureServer serves it over HTTP
+with injected latency and errors, so builds run offline and deterministically, e.g.
+    python -m utils.fixtures synthesize fixtures/ --scale 1
+    python -m utils.fixtures serve fixtures/ --latency 0.05 --error-rate 0.1
+"""
+import argparse
+import hashlib
+import html
+import json
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from .http_client import HttpClient
+from .law_of_one import (
+    LawOfOneDatabase, LAWOFONE_URL, LLRESEARCH_URL, LLRESEARCH_SECTIONS,
+    DEFAULT_CONCURRENCY, DEFAULT_REQUESTS_PER_SECOND, REQUEST_TIMEOUT
+)
+
+# Sites served by FixtureServer, each under its own path prefix
+SITES = {'lawofone': LAWOFONE_URL, 'llresearch': LLRESEARCH_URL}
+
+# Response headers kept when recording
+RECORDED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+class FixtureSet:
+    """Captured responses, by absolute URL: {'status', 'headers', 'body' (bytes)}"""
+
+    def __init__(self):
+        self.pages = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.pages)
+
+    def add(self, url, body, status=200, headers=None):
+        """Store the response for a URL (replacing any earlier one); body is str or bytes"""
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        with self._lock:
+            self.pages[url.split('#')[0]] = {'status': status, 'headers': dict(headers or {}), 'body': body}
+
+    def get(self, url):
+        """Return the stored response for a URL, or None"""
+        return self.pages.get(url.split('#')[0])
+
+    def save(self, directory):
+        """Write the fixtures to a directory: manifest.json plus one file per page body"""
+        directory = Path(directory)
+        (directory / "pages").mkdir(parents=True, exist_ok=True)
+        manifest = []
+        for number, (url, page) in enumerate(sorted(self.pages.items())):
+            path = f"pages/{number}.html"
+            (directory / path).write_bytes(page['body'])
+            manifest.append({'url': url, 'status': page['status'], 'headers': page['headers'], 'file': path})
+        (directory / "manifest.json").write_text(json.dumps(manifest, indent=1))
+
+    @classmethod
+    def load(cls, directory):
+        """Read fixtures written by save()"""
+        directory = Path(directory)
+        fixtures = cls()
+        for entry in json.loads((directory / "manifest.json").read_text()):
+            fixtures.add(entry['url'], (directory / entry['file']).read_bytes(), entry['status'], entry['headers'])
+        return fixtures
+
+class RecordingHttpClient(HttpClient):
+    """HttpClient that also stores every successful response in a FixtureSet"""
+
+    def __init__(self, fixtures, **kwargs):
+        super().__init__(**kwargs)
+        self.fixtures = fixtures
+
+    def get(self, url, headers=None):
+        response = super().get(url, headers=headers)
+        if response.status_code == 200:
+            self.fixtures.add(url, response.content, 200,
+                              {name: response.headers[name] for name in RECORDED_HEADERS if name in response.headers})
+        return response
+
+def record_fixtures(concurrency=DEFAULT_CONCURRENCY, requests_per_second=DEFAULT_REQUESTS_PER_SECOND):
+    """Run a live scrape of both websites, returning every page it fetched as a FixtureSet"""
+    fixtures = FixtureSet()
+    with tempfile.TemporaryDirectory() as tmp:
+        db = LawOfOneDatabase(concurrency=concurrency, requests_per_second=requests_per_second,
+                              cache_file=Path(tmp) / "cache.sqlite3", load=False)
+        db.http.close()
+        db.http = RecordingHttpClient(fixtures, pool_size=db.concurrency, timeout=REQUEST_TIMEOUT,
+                                      rate_limiter=db.rate_limiter)
+        db._run_build()
+        db.http.close()
+    return fixtures
+
+def _page(title, body):
+    return f"<html><head><title>{html.escape(title)}</title></head><body>{body}</body></html>"
+
+def _link(url, base_url, text):
+    # Site-relative links, as on the real sites
+    href = url[len(base_url):] if url.startswith(base_url) else url
+    return f'<a href="{html.escape(href)}">{html.escape(text)}</a>'
+
+def synthetic_fixtures(corpus):
+    """Render a corpus (e.g. benchmark.synthetic_corpus) as the pages a build would scrape
+
+    A build from these pages fetches and parses the corpus's sessions, categories and
+    L/L Research sections (with a preview page for each non-PDF link).
+    """
+    fixtures = FixtureSet()
+    sessions = corpus['sessions']
+    categories = corpus['categories']
+
+    fixtures.add(f"{LAWOFONE_URL}/c/", _page("Categories", '<div class="categories">' + "".join(
+        _link(category['url'], LAWOFONE_URL, category['name']) for category in categories.values()
+    ) + "</div>"))
+    for category in categories.values():
+        fixtures.add(category['url'], _page(category['name'], '<div class="results">' + "".join(
+            f'<div class="result">{_link(question["url"], LAWOFONE_URL, question["text"])}</div>'
+            for question in category['questions']
+        ) + "</div>"))
+
+    fixtures.add(f"{LAWOFONE_URL}/results/", _page("Sessions", '<ul class="results-index">' + "".join(
+        f"<li>{_link(session['url'], LAWOFONE_URL, session['title'])}</li>" for session in sessions.values()
+    ) + "</ul>"))
+    for session in sessions.values():
+        fixtures.add(session['url'], _page(session['title'], "".join(
+            f'<div class="q">Questioner: {html.escape(qa_pair["question"])}</div>'
+            f'<div class="a">Ra: {html.escape(qa_pair["answer"])}</div>'
+            for qa_pair in session['qa_pairs']
+        )))
+
+    fixtures.add(f"{LLRESEARCH_URL}/library/", _page("Library", '<div class="entry-content"><p>Library</p></div>'))
+    for section_key, section_path in LLRESEARCH_SECTIONS.items():
+        pages = corpus['llresearch_content'].get(section_key) or [{'title': section_key, 'content': []}]
+        paragraphs = []
+        for item in pages[0]['content']:
+            if item['type'] == 'link':
+                link = item['data']
+                # A paragraph holding a link is parsed as the link plus a text item
+                paragraphs.append(f"<p>{_link(link['url'], LLRESEARCH_URL, link['text'])}</p>")
+                if not link['url'].endswith('.pdf'):
+                    fixtures.add(link['url'], _page(link['text'], f'<div class="entry-content"><p>{html.escape(link["content"])}</p></div>'))
+            elif item['type'] == 'text':
+                paragraphs.append(f"<{item['tag']}>{html.escape(item['data'])}</{item['tag']}>")
+        fixtures.add(f"{LLRESEARCH_URL}{section_path}", _page(pages[0]['title'], '<div class="entry-content">' + "".join(paragraphs) + "</div>"))
+
+    return fixtures
+
+class FixtureServer:
+    """Local HTTP server replaying a FixtureSet in place of the real websites
+
+    Each site in SITES is served under its own prefix; pass lawofone_url/llresearch_url
+    to LawOfOneDatabase. Every response is delayed by latency plus up to jitter seconds,
+    and a fraction error_rate of requests fails with error_status. Both are drawn per
+    (path, attempt), so a build sees the same delays and failures on every run whatever
+    its concurrency. ETag/If-None-Match is supported, so refresh_database gets 304s.
+    """
+
+    def __init__(self, fixtures, host='127.0.0.1', port=0, latency=0.0, jitter=0.0,
+                 error_rate=0.0, error_status=503, seed=0):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.seed = seed
+        self._attempts = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._server = ThreadingHTTPServer((host, port), _FixtureRequestHandler)
+        self._server.daemon_threads = True
+        self._server.fixture_server = self
+        self.reset_stats()
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, site):
+        """Return the local base URL standing in for a site ('lawofone' or 'llresearch')"""
+        return f"{self.base_url}/{site}"
+
+    @property
+    def lawofone_url(self):
+        return self.url('lawofone')
+
+    @property
+    def llresearch_url(self):
+        return self.url('llresearch')
+
+    def start(self):
+        """Serve on a background thread; returns self"""
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fixture-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """Serve on the calling thread until interrupted"""
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def reset_stats(self):
+        """Zero the request counters (and the per-path attempt numbers)"""
+        with self._lock:
+            self._attempts = {}
+            self._stats = {'requests': 0, 'injected_errors': 0, 'not_modified': 0, 'not_found': 0, 'bytes': 0}
+
+    def stats(self):
+        """Return a snapshot of the request counters"""
+        with self._lock:
+            return dict(self._stats)
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            self._stats[counter] += amount
+
+    def respond(self, path, headers):
+        """Return (status, headers, body) for a request path, sleeping for the injected latency"""
+        with self._lock:
+            attempt = self._attempts.get(path, 0)
+            self._attempts[path] = attempt + 1
+            self._stats['requests'] += 1
+
+        rng = random.Random(f"{self.seed}:{path}:{attempt}")
+        delay = self.latency + rng.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+        if rng.random() < self.error_rate:
+            self._count('injected_errors')
+            return self.error_status, {}, b""
+
+        site, _, site_path = path.lstrip('/').partition('/')
+        page = self.fixtures.get(SITES[site] + '/' + site_path) if site in SITES else None
+        if page is None:
+            self._count('not_found')
+            return 404, {}, b""
+
+        response_headers = dict(page['headers'])
+        response_headers.setdefault('ETag', '"' + hashlib.sha1(page['body']).hexdigest()[:16] + '"')
+        if headers.get('If-None-Match') == response_headers['ETag']:
+            self._count('not_modified')
+            return 304, {'ETag': response_headers['ETag']}, b""
+
+        # Point absolute links at the stand-in sites too
+        body = page['body']
+        for other_site, site_url in SITES.items():
+            body = body.replace(site_url.encode('utf-8'), self.url(other_site).encode('utf-8'))
+        self._count('bytes', len(body))
+        return page['status'], response_headers, body
+
+class _FixtureRequestHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so the client's connection pool behaves as it does against the real sites
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        status, headers, body = self.server.fixture_server.respond(self.path, self.headers)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record, synthesize or serve Law of One website fixtures")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record = subparsers.add_parser('record', help="scrape the live websites into a fixtures directory")
+    record.add_argument('directory')
+    record.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY)
+    record.add_argument('--rate', type=float, default=DEFAULT_REQUESTS_PER_SECOND, help="requests per second")
+
+    synthesize = subparsers.add_parser('synthesize', help="write fixtures rendered from a synthetic corpus")
+    synthesize.add_argument('directory')
+    synthesize.add_argument('--scale', type=float, default=1)
+    synthesize.add_argument('--seed', type=int, default=0)
+
+    serve = subparsers.add_parser('serve', help="serve a fixtures directory")
+    serve.add_argument('directory')
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8000)
+    serve.add_argument('--latency', type=float, default=0.0, help="seconds added to every response")
+    serve.add_argument('--jitter', type=float, default=0.0, help="up to this many more seconds, at random")
+    serve.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests that fail")
+    serve.add_argument('--error-status', type=int, default=503)
+    serve.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.command == 'record':
+        fixtures = record_fixtures(args.concurrency, args.rate)
+        fixtures.save(args.directory)
+        print(f"Recorded {len(fixtures)} pages to {args.directory}")
+    elif args.command == 'synthesize':
+        from .benchmark import synthetic_corpus
+        fixtures = synthetic_fixtures(synthetic_corpus(args.scale, args.seed))
+        fixtures.save(args.directory)
+        print(f"Wrote {len(fixtures)} pages to {args.directory}")
+    else:
+        server = FixtureServer(FixtureSet.load(args.directory), args.host, args.port, args.latency,
+                               args.jitter, args.error_rate, args.error_status, args.seed)
+        print(f"Serving {len(server.fixtures)} pages: lawofone_url={server.lawofone_url} llresearch_url={server.llresearch_url}")
+        server.serve_forever()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Responses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+USER_AGENT = "SoulCompass/1.0 (Law of One database builder)"
+
+class HttpClient:
+    """Pooled, keep-alive HTTP client with timeouts, retry/backoff and counters"""
+
+    def __init__(self, pool_size=10, timeout=30, max_retries=3, backoff_factor=0.5,
+                 max_backoff=30.0, rate_limiter=None):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.rate_limiter = rate_limiter
+
+        # One connection pool per host, sized for the number of concurrent workers
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = USER_AGENT
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Zero the request counters"""
+        with self._lock:
+            self._stats = {
+                'requests': 0,          # HTTP attempts, including retries
+                'retries': 0,
+                'not_modified': 0,      # 304 responses to conditional requests
+                'errors': 0,            # requests that failed after all retries
+                'bytes': 0,             # response body bytes received
+                'request_seconds': 0.0, # time spent waiting on responses (summed over workers)
+                'backoff_seconds': 0.0
+            }
+
+    def stats(self):
+        """Return a snapshot of the request counters"""
+        with self._lock:
+            return dict(self._stats)
+
+    def get(self, url, headers=None):
+        """GET a URL, retrying connection errors, timeouts, 429 and 5xx with exponential backoff"""
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+
+            start = time.perf_counter()
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                self._record(start, 0)
+                if attempt == self.max_retries:
+                    self._count('errors')
+                    raise
+                self._backoff(attempt)
+                continue
+
+            self._record(start, len(response.content))
+            if response.status_code == 304:
+                self._count('not_modified')
+            elif response.status_code in RETRY_STATUSES:
+                if attempt == self.max_retries:
+                    self._count('errors')
+                    return response
+                self._backoff(attempt, response.headers.get('Retry-After'))
+                continue
+
+            return response
+
+    def close(self):
+        """Close the pooled connections"""
+        self.session.close()
+
+    def _record(self, start, size):
+        """Count one HTTP attempt"""
+        with self._lock:
+            self._stats['requests'] += 1
+            self._stats['bytes'] += size
+            self._stats['request_seconds'] += time.perf_counter() - start
+
+    def _count(self, counter):
+        with self._lock:
+            self._stats[counter] += 1
+
+    def _backoff(self, attempt, retry_after=None):
+        """Sleep before the next attempt, honouring a numeric Retry-After header"""
+        delay = self.backoff_factor * (2 ** attempt)
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, int(retry_after))
+        delay = min(delay, self.max_backoff)
+
+        with self._lock:
+            self._stats['retries'] += 1
+            self._stats['backoff_seconds'] += delay
+        time.sleep(delay)
@@ -0,0 +1,144 @@
+import random
+import threading
+
+# Search query prefix for each journal entry type
+QUERY_PREFIXES = {
+    "Emotion": "emotions",
+    "Dream": "dreams",
+    "Synchronicity": "synchronicity"
+}
+
+# Fallback insights if database search fails
+FALLBACK_INSIGHTS = {
+    "Emotion": [
+        "I am Ra. The emotions you are experiencing are catalysts for spiritual growth. Remember that all is one, and these feelings are part of the Creator experiencing itself.",
+        "I am Ra. Your emotional state is a distortion of the One Infinite Creator. By accepting and balancing these emotions, you move closer to understanding the Law of One.",
+        "I am Ra. The emotions you describe are vibrations that can be balanced through meditation and contemplation. As you balance these energies, you open pathways to intelligent infinity."
+    ],
+    "Dream": [
+        "I am Ra. The dream state offers access to the deeper portions of the mind complex, where symbols and archetypes reside. Your dream contains symbols that reflect your current spiritual journey.",
+        "I am Ra. Dreams often serve as a bridge between your conscious mind and the cosmic mind. The imagery you describe suggests communication from your higher self regarding your spiritual path.",
+        "I am Ra. In the dream state, the veil between densities thins, allowing glimpses of other realities and potentials."
+    ],
+    "Synchronicity": [
+        "I am Ra. What you call synchronicity is often the higher self communicating through the illusion of space/time. These patterns indicate alignment with your spiritual purpose.",
+        "I am Ra. Synchronicities are moments when the veil thins, allowing you to perceive the interconnectedness of all things. They often appear when you are moving in harmony with your pre-incarnative choices.",
+        "I am Ra. The meaningful coincidences you describe are manifestations of the Law of One in action."
+    ]
+}
+
+def insight_query(entry_type, entry_text):
+    """Return the search query used to find an insight for a journal entry"""
+    return f"{QUERY_PREFIXES[entry_type]} {entry_text}"
+
+def format_insight(entry_type, entry_text, results):
+    """Turn search results (best first) into an insight, or a fallback insight if there is no usable match"""
+    insight, source_ref = _best_passage(results)
+    if not insight:
+        # Use fallback if no relevant results found
+        return random.choice(FALLBACK_INSIGHTS[entry_type])
+    
+    # Ensure it starts with Ra's greeting if it doesn't already
+    if not insight.startswith("I am Ra"):
+        insight = "I am Ra. " + insight
+        
+    # Add personalized elements based on the entry text
+    if "challenge" in entry_text.lower() or "difficult" in entry_text.lower():
+        personalized = " The challenges you face are opportunities for polarization and growth toward the Creator."
+    elif "joy" in entry_text.lower() or "happy" in entry_text.lower():
+        personalized = " Your experience of joy is a glimpse of the true nature of the Creator, which is infinite love and light."
+    elif "confused" in entry_text.lower() or "uncertain" in entry_text.lower():
+        personalized = " Confusion is often a precursor to understanding. Sit with this catalyst and allow it to transform within you."
+    elif "meditation" in entry_text.lower():
+        personalized = " Your meditation practice strengthens your connection to intelligent infinity and accelerates your spiritual evolution."
+    else:
+        personalized = " Remember that you are on a unique path of seeking, and each experience brings you closer to understanding the Law of One."
+    
+    return insight + personalized + source_ref
+
+def _best_passage(results):
+    """Return (text, source reference) of the most relevant result, or (None, None) if there is none"""
+    if not results:
+        return None, None
+    best_match = results[0]
+    if best_match['source'] == 'lawofone.info':
+        return best_match['answer'], f"\n\n[From Session {best_match['session_id']}]"
+    
+    # L/L Research pages give their matching items: paragraphs, or links (dicts) given by their text
+    snippets = [snippet if isinstance(snippet, str) else snippet.get('text', '') for snippet in best_match['content'][:2]]
+    text = " ".join(snippet for snippet in snippets if snippet)
+    return text or None, f"\n\n[From {best_match['title']}]"
+
+def generate_insight(db, entry_type, entry_text):
+    """Return (insight, corpus version, ranking mode) for a journal entry
+    
+    The version and ranking are None for a fallback insight given because the database
+    isn't loaded yet or the search failed, so InsightRefreshJob retries it later. A
+    fallback given because nothing matched carries the version, as a retry would match nothing too.
+    """
+    if db is None:
+        return random.choice(FALLBACK_INSIGHTS[entry_type]), None, None
+    
+    try:
+        # Search the database (only the best match is used)
+        results = db.search(insight_query(entry_type, entry_text), limit=1)
+    except Exception as e:
+        print(f"Error generating insight: {e}")
+        return random.choice(FALLBACK_INSIGHTS[entry_type]), None, None
+    
+    try:
+        insight = format_insight(entry_type, entry_text, results)
+    except Exception as e:
+        print(f"Error generating insight: {e}")
+        insight = random.choice(FALLBACK_INSIGHTS[entry_type])
+    return insight, db.corpus_version(), db.ranking
+
+class InsightRefreshJob:
+    """Background job regenerating the journal insights that came from another corpus version or ranking mode"""
+    
+    def __init__(self, db, store, batch_size=50):
+        self.db = db
+        self.store = store
+        self.batch_size = batch_size
+        self.corpus_version = db.corpus_version()
+        self.ranking = db.ranking
+        self.updated = 0
+        self.failed = 0
+        self._thread = threading.Thread(target=self.run, name="insight-refresh", daemon=True)
+    
+    def start(self):
+        self._thread.start()
+    
+    def is_running(self):
+        return self._thread.is_alive()
+    
+    def run(self):
+        """Regenerate every stale insight once, a batch of entries at a time"""
+        try:
+            last_id = 0
+            while True:
+                entries = self.store.list_stale_insights(self.corpus_version, self.ranking, after_id=last_id, limit=self.batch_size)
+                if not entries:
+                    break
+                last_id = entries[-1]['id']
+                
+                # One batch search for all the entries
+                queries = [insight_query(entry['entry_type'], entry['description']) for entry in entries]
+                insights = []
+                for entry, results in zip(entries, self.db.search_many(queries, k=1)):
+                    try:
+                        insight = format_insight(entry['entry_type'], entry['description'], results)
+                    except Exception as e:
+                        # Still stored under the current version, so the entry isn't retried on every start
+                        print(f"Error regenerating insight for journal entry {entry['id']}: {e}")
+                        insight = random.choice(FALLBACK_INSIGHTS[entry['entry_type']])
+                        self.failed += 1
+                    insights.append((entry['id'], insight))
+                
+                self.store.update_insights(insights, self.corpus_version, self.ranking)
+                self.updated += len(insights)
+        except Exception as e:
+            print(f"Error regenerating journal insights: {e}")
+        
+        if self.updated:
+            print(f"Regenerated {self.updated} journal insights ({self.failed} replaced by fallbacks)")
@@ -0,0 +1,116 @@
+import csv
+import io
+import json
+
+from .journal_store import COLUMNS
+
+# PyArrow is only needed for the Parquet export
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pc = None
+    pq = None
+
+def parquet_available():
+    """Return True if PyArrow is installed"""
+    return pa is not None
+
+def export_formats():
+    """Return {format name: (file extension, MIME type)} for the available export formats"""
+    formats = {
+        'CSV': ('csv', 'text/csv'),
+        'JSON Lines': ('jsonl', 'application/x-ndjson')
+    }
+    if parquet_available():
+        formats['Parquet'] = ('parquet', 'application/vnd.apache.parquet')
+    return formats
+
+def iter_export(store, owner, export_format, chunk_size=500):
+    """Yield the owner's journal in the given format as chunks of bytes, one chunk per batch of entries
+
+    Only one batch of entries is held at a time; join the chunks for st.download_button.
+    """
+    chunks = store.iter_row_chunks(owner, chunk_size)
+    if export_format == 'CSV':
+        return _iter_csv(chunks)
+    elif export_format == 'JSON Lines':
+        return _iter_jsonl(chunks)
+    elif export_format == 'Parquet' and parquet_available():
+        return _iter_parquet(chunks)
+    raise ValueError(f"Unknown export format: {export_format}")
+
+def _iter_csv(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for rows in chunks:
+        # Dates are stored as ISO text, so rows are written as they come
+        writer.writerows(rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+def _iter_jsonl(chunks):
+    for rows in chunks:
+        yield "".join(json.dumps(dict(zip(COLUMNS, row)), ensure_ascii=False) + "\n" for row in rows).encode('utf-8')
+
+def _parquet_schema():
+    return pa.schema([
+        ('id', pa.int64()),
+        ('entry_type', pa.string()),
+        ('entry_date', pa.date32()),
+        ('emotion', pa.string()),
+        ('rating', pa.int64()),
+        ('description', pa.string()),
+        ('insight', pa.string()),
+        ('created_at', pa.string()),
+        ('insight_version', pa.string()),
+        ('insight_ranking', pa.string())
+    ])
+
+def _iter_parquet(chunks):
+    schema = _parquet_schema()
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    for rows in chunks:
+        columns = dict(zip(COLUMNS, zip(*rows)))
+        arrays = [
+            # One vectorized cast turns the chunk's ISO date strings into Parquet dates
+            pc.cast(pa.array(columns[field.name], pa.string()), pa.date32()) if field.name == 'entry_date'
+            else pa.array(columns[field.name], field.type)
+            for field in schema
+        ]
+        # Each chunk becomes a row group, handed on as soon as it is written
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only stream that hands its bytes to the caller in chunks instead of keeping them"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        """Return and forget everything written since the last drain"""
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
@@ -0,0 +1,192 @@
+import datetime
+import sqlite3
+import threading
+from pathlib import Path
+
+# Journal entries live next to the Law of One cache
+JOURNAL_FILE = Path(__file__).parent.parent / "data" / "journal.sqlite3"
+
+# Bump this whenever the table layout changes (kept in PRAGMA user_version)
+JOURNAL_SCHEMA_VERSION = 3
+
+# Owner of the journal shared by every visitor (SOULCOMPASS_SHARED_JOURNAL=1), which also
+# holds the entries saved before journals had owners
+SHARED_OWNER = 'shared'
+
+# Entry types, and the label of each type's 1-10 rating
+ENTRY_TYPES = ('Emotion', 'Dream', 'Synchronicity')
+RATING_LABELS = {'Emotion': 'Intensity', 'Dream': 'Clarity', 'Synchronicity': 'Significance'}
+
+COLUMNS = ('id', 'entry_type', 'entry_date', 'emotion', 'rating', 'description', 'insight', 'created_at',
+           'insight_version', 'insight_ranking')
+
+class JournalStore:
+    """SQLite-backed journal entries, queried (filtered, sorted and paged) by the database
+
+    Every entry belongs to an owner id, and entries are only ever listed, counted or
+    exported for one owner at a time.
+    """
+
+    def __init__(self, path=JOURNAL_FILE):
+        self.path = Path(path)
+        self.path.parent.mkdir(exist_ok=True)
+        self._lock = threading.Lock()
+        # Streamlit serves each session from its own thread, so share one guarded connection
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        """Create the entries table and its indexes, or upgrade a journal from an older version"""
+        with self._lock, self._conn:
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            if version == JOURNAL_SCHEMA_VERSION:
+                return
+            if version > JOURNAL_SCHEMA_VERSION:
+                raise ValueError(f"Journal {self.path} has schema version {version}, expected {JOURNAL_SCHEMA_VERSION}")
+            if version:
+                self._upgrade_schema(version)
+                return
+
+            self._conn.execute("""CREATE TABLE IF NOT EXISTS entries (
+                id INTEGER PRIMARY KEY,
+                owner TEXT NOT NULL,           -- whose journal the entry is in
+                entry_type TEXT NOT NULL,
+                entry_date TEXT NOT NULL,      -- ISO date, so it sorts and compares as text
+                emotion TEXT,                  -- emotion entries only
+                rating INTEGER,                -- intensity, clarity or significance (1-10)
+                description TEXT NOT NULL,
+                insight TEXT,
+                created_at TEXT NOT NULL,
+                insight_version TEXT,          -- corpus version and ranking mode that produced
+                insight_ranking TEXT           -- the insight (NULL for fallback insights)
+            )""")
+            self._create_indexes()
+            self._conn.execute(f"PRAGMA user_version = {JOURNAL_SCHEMA_VERSION}")
+
+    def _create_indexes(self):
+        # History is listed newest first for one owner, optionally for one entry type
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_by_owner_date ON entries (owner, entry_date, id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_by_owner_type_date ON entries (owner, entry_type, entry_date, id)")
+
+    def _upgrade_schema(self, version):
+        """Upgrade the entries table from an older schema version, inside the caller's transaction"""
+        if version < 2:
+            # Version 1 didn't record what produced each insight, so all of them count as stale
+            self._conn.execute("ALTER TABLE entries ADD COLUMN insight_version TEXT")
+            self._conn.execute("ALTER TABLE entries ADD COLUMN insight_ranking TEXT")
+        if version < 3:
+            # Entries from before journals had owners go to the shared journal
+            self._conn.execute(f"ALTER TABLE entries ADD COLUMN owner TEXT NOT NULL DEFAULT '{SHARED_OWNER}'")
+            self._conn.execute("DROP INDEX IF EXISTS entries_by_date")
+            self._conn.execute("DROP INDEX IF EXISTS entries_by_type_date")
+            self._create_indexes()
+        self._conn.execute(f"PRAGMA user_version = {JOURNAL_SCHEMA_VERSION}")
+
+    def add_entry(self, owner, entry_type, entry_date, description, insight=None, emotion=None, rating=None,
+                  insight_version=None, insight_ranking=None):
+        """Save a new entry in the owner's journal; returns its id
+
+        insight_version/insight_ranking record the corpus version and ranking mode the
+        insight came from (None for a fallback insight).
+        """
+        if entry_type not in ENTRY_TYPES:
+            raise ValueError(f"Unknown entry type: {entry_type}")
+
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO entries (owner, entry_type, entry_date, emotion, rating, description, insight, created_at, "
+                "insight_version, insight_ranking) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (owner, entry_type, entry_date.isoformat(), emotion, rating, description, insight,
+                 datetime.datetime.now().isoformat(timespec='seconds'), insight_version, insight_ranking)
+            )
+        return cursor.lastrowid
+
+    def list_stale_insights(self, insight_version, insight_ranking, after_id=0, limit=50):
+        """Return entries of every owner (by id, after after_id) whose insight came from another corpus version or ranking"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM entries WHERE id > ? "
+                "AND (insight_version IS NOT ? OR insight_ranking IS NOT ?) ORDER BY id LIMIT ?",
+                (after_id, insight_version, insight_ranking, limit)
+            ).fetchall()
+        return [_entry(row) for row in rows]
+
+    def update_insights(self, insights, insight_version, insight_ranking):
+        """Store regenerated insights, given as (entry id, insight) pairs"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE entries SET insight = ?, insight_version = ?, insight_ranking = ? WHERE id = ?",
+                [(insight, insight_version, insight_ranking, entry_id) for entry_id, insight in insights]
+            )
+
+    def count_entries(self, owner, **filters):
+        """Return the number of the owner's entries matching the filters (see list_entries)"""
+        where, params = _where(owner, **filters)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM entries{where}", params).fetchone()[0]
+
+    def list_entries(self, owner, limit=None, offset=0, **filters):
+        """Return the owner's entry dicts, newest first (by date, then by when they were saved)
+
+        Filters: entry_types (a list), start_date/end_date (inclusive datetime.dates) and
+        min_rating/max_rating; None means "no filter". limit/offset select one page.
+        """
+        where, params = _where(owner, **filters)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM entries{where} ORDER BY entry_date DESC, id DESC LIMIT ? OFFSET ?",
+                params + [-1 if limit is None else limit, offset]
+            ).fetchall()
+        return [_entry(row) for row in rows]
+
+    def iter_row_chunks(self, owner, chunk_size=500):
+        """Yield every entry of the owner as lists of raw row tuples (COLUMNS order, ISO date strings), oldest first
+
+        Each chunk is its own keyset query on the date index, so memory use stays flat and
+        other sessions aren't locked out while the caller works on a chunk.
+        """
+        last_date, last_id = '', 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT {', '.join(COLUMNS)} FROM entries WHERE owner = ? AND (entry_date, id) > (?, ?) "
+                    "ORDER BY entry_date, id LIMIT ?",
+                    (owner, last_date, last_id, chunk_size)
+                ).fetchall()
+            if not rows:
+                return
+            yield rows
+            last_date, last_id = rows[-1][2], rows[-1][0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def _where(owner, entry_types=None, start_date=None, end_date=None, min_rating=None, max_rating=None):
+    """Build the WHERE clause and parameters for one owner's entries and the history filters"""
+    conditions = ["owner = ?"]
+    params = [owner]
+    if entry_types is not None:
+        # An empty list matches nothing
+        conditions.append(f"entry_type IN ({', '.join('?' * len(entry_types))})" if entry_types else "0")
+        params.extend(entry_types)
+    if start_date is not None:
+        conditions.append("entry_date >= ?")
+        params.append(start_date.isoformat())
+    if end_date is not None:
+        conditions.append("entry_date <= ?")
+        params.append(end_date.isoformat())
+    if min_rating is not None:
+        conditions.append("rating >= ?")
+        params.append(min_rating)
+    if max_rating is not None:
+        conditions.append("rating <= ?")
+        params.append(max_rating)
+    return " WHERE " + " AND ".join(conditions), params
+
+def _entry(row):
+    """Turn an entries row into an entry dict, with the date as a datetime.date"""
+    entry = dict(zip(COLUMNS, row))
+    entry['entry_date'] = datetime.date.fromisoformat(entry['entry_date'])
+    return entry
@@ -0,0 +1,43 @@
+import math
+import threading
+from collections import deque
+
+class LatencyTracker:
+    """Thread-safe record of recent request latencies, with percentile summaries"""
+
+    def __init__(self, max_samples=1000):
+        # Only the most recent samples are kept, so the percentiles follow current behaviour
+        self._samples = deque(maxlen=max_samples)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        """Record one request's latency in seconds"""
+        with self._lock:
+            self._samples.append(seconds)
+            self._count += 1
+
+    def percentile(self, p):
+        """Return the p-th percentile (0-100) of the recent samples in seconds, or None"""
+        with self._lock:
+            samples = sorted(self._samples)
+        return _nearest_rank(samples, p)
+
+    def summary(self):
+        """Return {'count', 'p50', 'p95', 'max'} over the recent samples (seconds; None if empty)"""
+        with self._lock:
+            samples = sorted(self._samples)
+            count = self._count
+        return {
+            'count': count,
+            'p50': _nearest_rank(samples, 50),
+            'p95': _nearest_rank(samples, 95),
+            'max': samples[-1] if samples else None
+        }
+
+def _nearest_rank(samples, p):
+    """Nearest-rank percentile of an already sorted list"""
+    if not samples:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(samples)))
+    return samples[rank - 1]
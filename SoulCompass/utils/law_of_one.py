@@ -1,195 +1,418 @@
-import requests
-from bs4 import BeautifulSoup
 import re
 import time
-import os
+import heapq
 import json
-import pickle
+import multiprocessing
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from pathlib import Path
 
+from .search_index import InvertedIndex, INDEX_VERSION
+from .tfidf import TfidfMatrix, row_scores
+from .rate_limit import TokenBucket
+from .http_client import HttpClient
+from .latency import LatencyTracker
+from .response_cache import ResponseCache
+from .metrics import metrics
+from .cache_store import load_cache, save_cache, is_pickle_cache
+from .ranking import tokenize, normalize_text
+from .parsers import (
+    safe_parse, parse_categories, parse_category_questions, parse_session_index,
+    parse_session, parse_llresearch_section, parse_link_preview
+)
+
 # Base URLs for Law of One content
 LAWOFONE_URL = "https://www.lawofone.info"
 LLRESEARCH_URL = "https://www.llresearch.org"
 
+# L/L Research sections scraped, by key, with their paths on the site
+LLRESEARCH_SECTIONS = {
+    'ra_contact': '/library/the-ra-contact-teaching-the-law-of-one/',
+    'channeling_archives': '/channeling-archives-2/',
+    'books': '/library/the-law-of-one-books/'
+}
+
 # Create a cache directory if it doesn't exist
 CACHE_DIR = Path(__file__).parent.parent / "data"
 CACHE_DIR.mkdir(exist_ok=True)
-CACHE_FILE = CACHE_DIR / "law_of_one_cache.pkl"
+CACHE_FILE = CACHE_DIR / "law_of_one_cache.sqlite3"
+
+# Caches written before the SQLite store; still readable (and migrated on first load)
+LEGACY_CACHE_FILE = CACHE_DIR / "law_of_one_cache.pkl"
+
+# Ranking modes accepted by LawOfOneDatabase.search
+RANKING_MODES = ('legacy', 'bm25', 'tfidf', 'fts5')
+
+# Scraping defaults: parallel fetch workers and the polite request rate shared by all of them
+DEFAULT_CONCURRENCY = 4
+DEFAULT_REQUESTS_PER_SECOND = 2.0
+REQUEST_TIMEOUT = 30
+
+# Responses to recent queries are cached: at most this many, each for this many seconds
+DEFAULT_RESPONSE_CACHE_SIZE = 256
+DEFAULT_RESPONSE_CACHE_TTL = 600.0
 
 class LawOfOneDatabase:
-    def __init__(self):
+    def __init__(self, ranking='legacy', concurrency=DEFAULT_CONCURRENCY,
+                 requests_per_second=DEFAULT_REQUESTS_PER_SECOND, cache_file=CACHE_FILE,
+                 lawofone_url=LAWOFONE_URL, llresearch_url=LLRESEARCH_URL, parse_workers=0, load=True,
+                 response_cache_size=DEFAULT_RESPONSE_CACHE_SIZE, response_cache_ttl=DEFAULT_RESPONSE_CACHE_TTL):
+        if ranking not in RANKING_MODES:
+            raise ValueError(f"Unknown ranking mode: {ranking}")
+        self.ranking = ranking
+        
+        # Wall-clock time of each search call, for the latency debug panel
+        self.search_latency = LatencyTracker()
+        
+        # search/get_ra_response results by normalized query; cleared whenever the index is rebuilt
+        self.response_cache = ResponseCache(max_size=response_cache_size, ttl=response_cache_ttl)
+        
+        # Scraping settings; the URLs can point at a local stand-in server for testing
+        self.concurrency = max(1, concurrency)
+        self.rate_limiter = TokenBucket(requests_per_second)
+        self.http = HttpClient(pool_size=self.concurrency, timeout=REQUEST_TIMEOUT, rate_limiter=self.rate_limiter)
+        self.build_stats = None
+        self.cache_file = Path(cache_file)
+        self.lawofone_url = lawofone_url
+        self.llresearch_url = llresearch_url
+        
+        # HTML parsing is CPU-bound, so a build can parse pages in a process pool of
+        # parse_workers processes (0 or 1 parses in-process). Off by default: spawned workers
+        # re-run the __main__ script, which under Streamlit is the page that started the build
+        self.parse_workers = parse_workers
+        self._parse_pool = None
+        
         self.sessions = {}
         self.categories = {}
         self.llresearch_content = {}
-        self.load_or_build_database()
+        self.index = None
+        self.tfidf = None
+        
+        # ETag/Last-Modified per URL, for conditional GETs in refresh_database
+        self.validators = {}
+        self._conditional = False
+        self._changed_urls = set()
+        
+        # Open SqliteStore backing lazily loaded records, if any
+        self._store = None
+        
+        # What the current load/build is doing, readable from other threads
+        self._progress_lock = threading.Lock()
+        self.progress = {'stage': 'idle', 'sessions_fetched': 0, 'sessions_total': 0}
+        
+        # With load=False the caller runs load_or_build_database itself (e.g. on a background thread)
+        if load:
+            self.load_or_build_database()
         
     def load_or_build_database(self):
         """Load cached data or build the database if needed"""
-        if CACHE_FILE.exists():
-            try:
-                with open(CACHE_FILE, 'rb') as f:
-                    cached_data = pickle.load(f)
-                    self.sessions = cached_data.get('sessions', {})
-                    self.categories = cached_data.get('categories', {})
-                    self.llresearch_content = cached_data.get('llresearch_content', {})
-                    
-                if self.sessions and self.categories:
-                    print("Loaded Law of One database from cache")
-                    return
-            except Exception as e:
-                print(f"Error loading cache: {e}")
+        self._set_progress('loading cache')
+        cached_data = None
+        migrating = False
+        try:
+            with metrics.timer('soulcompass_cache_load_seconds'):
+                cached_data = load_cache(self.cache_file)
+            
+            # Carry an existing pickle cache over to the default store instead of re-scraping
+            if cached_data is None and self.cache_file == CACHE_FILE and LEGACY_CACHE_FILE.exists():
+                print(f"Migrating {LEGACY_CACHE_FILE.name} to {CACHE_FILE.name}")
+                cached_data = load_cache(LEGACY_CACHE_FILE)
+                migrating = True
+        except Exception as e:
+            print(f"Error loading cache: {e}")
+        
+        if cached_data:
+            self.sessions = cached_data.get('sessions', {})
+            self.categories = cached_data.get('categories', {})
+            self.llresearch_content = cached_data.get('llresearch_content', {})
+            self.index = cached_data.get('index')
+            self.validators = cached_data.get('validators', {})
+            self._store = cached_data.get('store')
+            
+            if self.sessions and self.categories:
+                print("Loaded Law of One database from cache")
                 
+                # Older caches have no index (or an outdated one), so build it now
+                if self.index is None or getattr(self.index, 'version', None) != INDEX_VERSION or self.index.texts is None:
+                    self._build_index()
+                    self._save_cache()
+                elif migrating:
+                    self._save_cache()
+                self._set_progress('ready')
+                return
+        
         print("Building Law of One database (this may take a few minutes)...")
-        self._build_database()
+        self._run_build()
+        self._build_index()
         self._save_cache()
+        self._set_progress('ready')
+    
+    def refresh_database(self):
+        """Incrementally update the database, re-parsing only the pages that changed
+        
+        Every known page is re-requested with If-None-Match/If-Modified-Since, so pages
+        the server reports as unchanged (304) keep their cached content. Returns the
+        number of pages that changed.
+        """
+        print("Refreshing Law of One database...")
+        self._run_build(conditional=True)
+        
+        changed = self.build_stats['changed_pages']
+        if changed:
+            self._build_index()
+            self._save_cache()
+        self._set_progress('ready')
+        print(f"{changed} pages changed, {self.build_stats['not_modified']} not modified")
+        return changed
+    
+    def _run_build(self, conditional=False):
+        """Scrape the websites, recording HTTP counters for the run in build_stats"""
+        start = time.perf_counter()
+        self._materialize()
+        self.http.reset_stats()
+        self._changed_urls = set()
+        self._conditional = conditional
+        if self.parse_workers > 1:
+            # spawn, since forking a threaded (e.g. Streamlit) process is unsafe
+            self._parse_pool = ProcessPoolExecutor(max_workers=self.parse_workers, mp_context=multiprocessing.get_context('spawn'))
+        try:
+            self._build_database()
+        finally:
+            self._conditional = False
+            if self._parse_pool is not None:
+                self._parse_pool.shutdown()
+                self._parse_pool = None
+        
+        # Keep the HTTP counters of the build around for diagnostics
+        self.build_stats = self.http.stats()
+        self.build_stats['changed_pages'] = len(self._changed_urls)
+        self.build_stats['build_seconds'] = time.perf_counter() - start
+        print(f"Fetched {self.build_stats['requests']} pages ({self.build_stats['bytes']} bytes, "
+              f"{self.build_stats['retries']} retries) in {self.build_stats['build_seconds']:.1f}s")
+    
+    def corpus_version(self):
+        """Return an identifier of the indexed content, which changes whenever a rebuild or refresh changes it"""
+        if self.index is None:
+            return None
+        return f"{self.index.version}-{self.index.fingerprint[:16]}"
+    
+    def _set_progress(self, stage=None, **counts):
+        """Update the progress snapshot; counts are e.g. sessions_fetched/sessions_total"""
+        with self._progress_lock:
+            if stage is not None:
+                self.progress['stage'] = stage
+            self.progress.update(counts)
+    
+    def get_progress(self):
+        """Return a copy of the progress snapshot (stage, sessions_fetched, sessions_total)"""
+        with self._progress_lock:
+            return dict(self.progress)
+    
+    def _build_index(self):
+        """Build the inverted index used by search"""
+        self._set_progress('indexing')
+        with metrics.timer('soulcompass_build_phase_seconds', phase='index'):
+            self.index = InvertedIndex.build(self.sessions, self.llresearch_content)
+        self.tfidf = None
+        self.response_cache.clear()
+    
+    def _build_tfidf(self):
+        """Build the sparse TF-IDF matrix over the indexed documents (needs numpy/scipy)"""
+        self.tfidf = TfidfMatrix.build(self.index.document_texts())
+    
+    def _materialize(self):
+        """Replace lazily loaded records with plain dicts, so they can be modified"""
+        if self._store is None:
+            return
+        self.sessions = dict(self.sessions.items())
+        self.categories = dict(self.categories.items())
+        self.llresearch_content = dict(self.llresearch_content.items())
+        if self.index is not None:
+            self.index.load_texts()
+        self._store.close()
+        self._store = None
     
     def _save_cache(self):
         """Save the database to cache"""
-        with open(CACHE_FILE, 'wb') as f:
-            pickle.dump({
+        # The store being replaced may be the one our lazy records read from
+        self._set_progress('saving')
+        self._materialize()
+        with metrics.timer('soulcompass_build_phase_seconds', phase='save'):
+            save_cache(self.cache_file, {
                 'sessions': self.sessions,
                 'categories': self.categories,
-                'llresearch_content': self.llresearch_content
-            }, f)
+                'llresearch_content': self.llresearch_content,
+                'index': self.index,
+                'validators': self.validators,
+                'texts': self.index.texts if self.index else None
+            })
         print("Law of One database cached for faster future loading")
+        
+        # Switch to reading lazily from the new store, which frees the freshly built dicts
+        if not is_pickle_cache(self.cache_file):
+            cached_data = load_cache(self.cache_file)
+            if cached_data:
+                self.sessions = cached_data['sessions']
+                self.categories = cached_data['categories']
+                self.llresearch_content = cached_data['llresearch_content']
+                self._store = cached_data['store']
+                # Same index, with its texts read from the new store instead of held in memory
+                self.index = cached_data['index']
     
     def _build_database(self):
         """Build the database by scraping the Law of One websites"""
         # First, get the lawofone.info content
-        self._fetch_categories()
-        self._fetch_sessions(limit=None)
+        self._set_progress('fetching categories')
+        with metrics.timer('soulcompass_build_phase_seconds', phase='categories'):
+            self._fetch_categories()
+        self._set_progress('fetching sessions')
+        with metrics.timer('soulcompass_build_phase_seconds', phase='sessions'):
+            self._fetch_sessions(limit=None)
         
         # Then get the llresearch.org content
-        self._fetch_llresearch_content()
+        self._set_progress('fetching L/L Research')
+        with metrics.timer('soulcompass_build_phase_seconds', phase='llresearch'):
+            self._fetch_llresearch_content()
+    
+    def _get(self, url):
+        """GET a URL through the pooled, rate-limited HTTP client
+        
+        During refresh_database the request is conditional on the cached validators,
+        and callers must treat a 304 response as "keep what we have".
+        """
+        headers = {}
+        validator = self.validators.get(url) if self._conditional else None
+        if validator:
+            if validator.get('etag'):
+                headers['If-None-Match'] = validator['etag']
+            if validator.get('last_modified'):
+                headers['If-Modified-Since'] = validator['last_modified']
+        
+        response = self.http.get(url, headers=headers or None)
+        
+        if response.status_code == 200:
+            self._changed_urls.add(url)
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            if etag or last_modified:
+                self.validators[url] = {'etag': etag, 'last_modified': last_modified}
+        return response
+    
+    def _run_concurrently(self, func, args_list):
+        """Call func once per argument tuple on the worker pool; results keep input order"""
+        if self.concurrency <= 1 or len(args_list) <= 1:
+            return [func(*args) for args in args_list]
+        
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            return list(executor.map(lambda args: func(*args), args_list))
+    
+    def _fetch_page(self, url):
+        """Fetch stage: GET a page, returning (status_code, html); html is None unless 200"""
+        try:
+            response = self._get(url)
+        except Exception as e:
+            print(f"Error fetching {url}: {e}")
+            return None, None
+        return response.status_code, response.text if response.status_code == 200 else None
+    
+    def _parse_many(self, parser, args_list):
+        """Parse stage: run a utils.parsers function per argument tuple on the process pool
+        
+        Returns (result, error) pairs in input order; small batches are parsed in-process.
+        """
+        if self._parse_pool is None or len(args_list) <= 1:
+            return [safe_parse(parser, *args) for args in args_list]
+        
+        chunksize = max(1, len(args_list) // (self.parse_workers * 4))
+        return list(self._parse_pool.map(safe_parse, [parser] * len(args_list), *zip(*args_list), chunksize=chunksize))
     
     def _fetch_categories(self):
         """Fetch the main categories from the Law of One material"""
         try:
-            response = requests.get(f"{LAWOFONE_URL}/c/")
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                categories_div = soup.find('div', class_='categories')
+            status, html = self._fetch_page(f"{self.lawofone_url}/c/")
+            if status == 200:
+                categories = parse_categories(html, self.lawofone_url)
                 
-                if categories_div:
-                    for link in categories_div.find_all('a'):
-                        category_url = link.get('href')
-                        category_name = link.text.strip()
-                        
-                        # Extract category id from URL
-                        category_id = category_url.split('/')[-2]
-                        
-                        self.categories[category_id] = {
-                            'name': category_name,
-                            'url': f"{LAWOFONE_URL}{category_url}",
-                            'questions': []
-                        }
-                        
-                        # Get questions in this category
-                        self._fetch_category_questions(category_id)
-                        
-                        # Be respectful to the server
-                        time.sleep(0.5)
+                if categories is not None:
+                    # Keep known questions until the category page is re-fetched
+                    for category_id, category in categories.items():
+                        category['questions'] = self.categories.get(category_id, {}).get('questions', [])
+                    self.categories = categories
+            elif status != 304:
+                return
+            
+            # Get the questions in each category
+            self._fetch_category_questions(list(self.categories))
         except Exception as e:
             print(f"Error fetching categories: {e}")
     
-    def _fetch_category_questions(self, category_id):
-        """Fetch questions in a specific category"""
-        try:
-            category_url = self.categories[category_id]['url']
-            response = requests.get(category_url)
-            
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                questions_div = soup.find('div', class_='results')
-                
-                if questions_div:
-                    for question in questions_div.find_all('div', class_='result'):
-                        question_link = question.find('a')
-                        
-                        if question_link:
-                            question_url = question_link.get('href')
-                            question_text = question_link.text.strip()
-                            
-                            # Extract question ID
-                            question_id = question_url.split('/')[-1]
-                            
-                            question_info = {
-                                'id': question_id,
-                                'text': question_text,
-                                'url': f"{LAWOFONE_URL}{question_url}",
-                                'session': question_url.split('/')[2],  # Extract session from URL
-                                'answer': None  # Will be populated when fetching sessions
-                            }
-                            
-                            self.categories[category_id]['questions'].append(question_info)
-        except Exception as e:
-            print(f"Error fetching questions for category {category_id}: {e}")
+    def _fetch_category_questions(self, category_ids):
+        """Fetch the questions in the given categories"""
+        pages = self._run_concurrently(self._fetch_page, [(self.categories[category_id]['url'],) for category_id in category_ids])
+        changed = [(category_id, html) for category_id, (status, html) in zip(category_ids, pages) if status == 200]
+        
+        parsed = self._parse_many(parse_category_questions, [(html, self.lawofone_url) for _, html in changed])
+        for (category_id, _), (questions, error) in zip(changed, parsed):
+            if error:
+                print(f"Error fetching questions for category {category_id}: {error}")
+            elif questions is not None:
+                self.categories[category_id]['questions'] = questions
     
     def _fetch_sessions(self, limit=None):
         """Fetch all session content from lawofone.info"""
         try:
             # Get the list of all sessions
-            response = requests.get(f"{LAWOFONE_URL}/results/")
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                session_links = soup.select('ul.results-index a')
-                
-                # Process each session
-                for i, link in enumerate(session_links):
+            status, html = self._fetch_page(f"{self.lawofone_url}/results/")
+            if status == 200:
+                # Collect the sessions to fetch
+                to_fetch = []
+                for i, session_url in enumerate(parse_session_index(html)):
                     if limit and i >= limit:
                         break
                         
-                    session_url = link.get('href')
                     session_id = session_url.split('/')[-1]
-                    
-                    print(f"Fetching session {session_id}...")
-                    
-                    # Fetch the session content
-                    self._fetch_session_content(session_id, f"{LAWOFONE_URL}{session_url}")
-                    
-                    # Be respectful to the server
-                    time.sleep(1)
+                    to_fetch.append((session_id, f"{self.lawofone_url}{session_url}"))
+            elif status == 304:
+                # The session list is unchanged, but each session page may not be
+                to_fetch = [(session_id, session['url']) for session_id, session in self.sessions.items()]
+            else:
+                return
+            
+            self._fetch_session_content(to_fetch)
+            
+            # Keep sessions in the site's order
+            self.sessions = {session_id: self.sessions[session_id] for session_id, _ in to_fetch if session_id in self.sessions}
                     
         except Exception as e:
             print(f"Error fetching sessions: {e}")
     
-    def _fetch_session_content(self, session_id, session_url):
-        """Fetch content for a specific session"""
-        try:
-            response = requests.get(session_url)
+    def _fetch_session_content(self, to_fetch):
+        """Fetch and parse the given (session_id, session_url) pages"""
+        print(f"Fetching {len(to_fetch)} sessions...")
+        self._set_progress(sessions_fetched=0, sessions_total=len(to_fetch))
+        
+        # Fetch stage on the thread pool (rate limited by _get), then parse stage on the process pool
+        pages = self._run_concurrently(self._fetch_session_page, [(session_url,) for _, session_url in to_fetch])
+        changed = [(session_id, session_url, html) for (session_id, session_url), (status, html) in zip(to_fetch, pages) if status == 200]
+        
+        parsed = self._parse_many(parse_session, [(html, session_id) for session_id, _, html in changed])
+        for (session_id, session_url, _), (session, error) in zip(changed, parsed):
+            if error:
+                print(f"Error fetching session {session_id}: {error}")
+                continue
             
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # Get title
-                title = soup.find('title').text if soup.find('title') else f"Session {session_id}"
-                
-                # Get all Q&A pairs
-                qa_pairs = []
-                
-                questions = soup.find_all('div', class_='q')
-                answers = soup.find_all('div', class_='a')
-                
-                for i, (q, a) in enumerate(zip(questions, answers)):
-                    q_text = q.get_text(strip=True).replace('Questioner:', '').strip()
-                    a_text = a.get_text(strip=True).replace('Ra:', '').strip()
-                    
-                    qa_pair = {
-                        'id': f"{session_id}.{i+1}",
-                        'question': q_text,
-                        'answer': a_text
-                    }
-                    
-                    qa_pairs.append(qa_pair)
-                
-                self.sessions[session_id] = {
-                    'title': title,
-                    'url': session_url,
-                    'qa_pairs': qa_pairs
-                }
-                
-        except Exception as e:
-            print(f"Error fetching session {session_id}: {e}")
+            self.sessions[session_id] = {
+                'title': session['title'],
+                'url': session_url,
+                'qa_pairs': session['qa_pairs']
+            }
+    
+    def _fetch_session_page(self, url):
+        """Fetch a session page, counting it in the progress snapshot"""
+        page = self._fetch_page(url)
+        with self._progress_lock:
+            self.progress['sessions_fetched'] += 1
+        return page
     
     def _fetch_llresearch_content(self):
         """Scrape content from the L/L Research website"""
@@ -198,21 +421,11 @@ class LawOfOneDatabase:
         
         try:
             # Fetch the library page which contains links to different types of material
-            response = requests.get(f"{LLRESEARCH_URL}/library/")
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # Find links to different sections
-                sections = {
-                    'ra_contact': '/library/the-ra-contact-teaching-the-law-of-one/',
-                    'channeling_archives': '/channeling-archives-2/',
-                    'books': '/library/the-law-of-one-books/'
-                }
-                
-                # Process each section
-                for section_key, section_path in sections.items():
-                    self._fetch_llresearch_section(section_key, f"{LLRESEARCH_URL}{section_path}")
-                    time.sleep(1)  # Be respectful to the server
+            status, _ = self._fetch_page(f"{self.llresearch_url}/library/")
+            if status in (200, 304):
+                # Process each section (rate limited by _get)
+                for section_key, section_path in LLRESEARCH_SECTIONS.items():
+                    self._fetch_llresearch_section(section_key, f"{self.llresearch_url}{section_path}")
                     
         except Exception as e:
             print(f"Error fetching L/L Research content: {e}")
@@ -221,105 +434,186 @@ class LawOfOneDatabase:
         """Fetch content from a specific section of the L/L Research website"""
         try:
             print(f"Fetching L/L Research section: {section_key}")
-            response = requests.get(section_url)
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
+            status, html = self._fetch_page(section_url)
+            if status == 200:
+                parsed = parse_llresearch_section(html, section_key, self.llresearch_url)
                 
-                # Find main content
-                content_div = soup.find('div', class_='entry-content')
-                if not content_div:
-                    content_div = soup.find('div', id='content')
-                
-                if content_div:
-                    # Extract paragraphs of content
-                    paragraphs = content_div.find_all(['p', 'h2', 'h3', 'h4'])
-                    section_content = []
+                if parsed is not None:
+                    title, section_content = parsed
                     
-                    for p in paragraphs:
-                        # Skip empty paragraphs
-                        if p.get_text(strip=True):
-                            # Check if it contains a link
-                            links = p.find_all('a')
-                            if links:
-                                for link in links:
-                                    href = link.get('href', '')
-                                    # Only process internal links or PDF links
-                                    if href and (href.startswith('/') or href.startswith(LLRESEARCH_URL) or href.endswith('.pdf')):
-                                        # Make sure the link is absolute
-                                        if href.startswith('/'):
-                                            href = f"{LLRESEARCH_URL}{href}"
-                                        
-                                        # Store the link and its text
-                                        link_info = {
-                                            'text': link.get_text(strip=True),
-                                            'url': href,
-                                            'content': self._extract_link_preview(href) if not href.endswith('.pdf') else "PDF Document"
-                                        }
-                                        section_content.append({
-                                            'type': 'link',
-                                            'data': link_info
-                                        })
-                            
-                            # Store the paragraph text
-                            section_content.append({
-                                'type': 'text',
-                                'data': p.get_text(strip=True),
-                                'tag': p.name
-                            })
+                    # Previews from the previous build, reused when a link page is unchanged
+                    previous_previews = {
+                        item['data']['url']: item['data']['content']
+                        for page in self.llresearch_content.get(section_key, [])
+                        for item in page.get('content', [])
+                        if item['type'] == 'link'
+                    }
                     
-                    # Store in the database
-                    if section_key not in self.llresearch_content:
-                        self.llresearch_content[section_key] = []
+                    # Fetch the link previews
+                    preview_urls = list(dict.fromkeys(
+                        item['data']['url'] for item in section_content
+                        if item['type'] == 'link' and not item['data']['url'].endswith('.pdf')
+                    ))
+                    previews = dict(zip(preview_urls, self._extract_link_preview(preview_urls, previous_previews)))
+                    for item in section_content:
+                        if item['type'] == 'link' and item['data']['url'] in previews:
+                            item['data']['content'] = previews[item['data']['url']]
                     
-                    self.llresearch_content[section_key].append({
+                    # Store in the database, replacing any earlier version of the page
+                    self.llresearch_content[section_key] = [{
                         'url': section_url,
-                        'title': soup.find('title').text if soup.find('title') else section_key,
+                        'title': title,
                         'content': section_content
-                    })
+                    }]
         except Exception as e:
             print(f"Error fetching L/L Research section {section_key}: {e}")
     
-    def _extract_link_preview(self, url):
-        """Extract a preview of content from a link for context"""
-        try:
-            # Skip PDFs
-            if url.endswith('.pdf'):
-                return "PDF Document"
-                
-            response = requests.get(url)
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # Get the first few paragraphs as a preview
-                content_div = soup.find('div', class_='entry-content')
-                if not content_div:
-                    content_div = soup.find('div', id='content')
-                
-                if content_div:
-                    paragraphs = content_div.find_all('p', limit=3)  # Limit to first 3 paragraphs
-                    preview = "\n".join([p.get_text(strip=True) for p in paragraphs if p.get_text(strip=True)])
-                    
-                    # Truncate if too long
-                    if len(preview) > 500:
-                        preview = preview[:500] + "..."
-                        
-                    return preview
-            
-            return "No preview available"
-        except Exception:
-            return "Error fetching preview"
+    def _extract_link_preview(self, urls, previous_previews=None):
+        """Extract a preview of content from each link for context
+        
+        previous_previews maps URLs to the preview from the last build, reused if the page is unchanged.
+        """
+        previous_previews = previous_previews or {}
+        pages = self._run_concurrently(self._fetch_page, [(url,) for url in urls])
+        
+        previews = []
+        to_parse = []
+        for url, (status, html) in zip(urls, pages):
+            if status == 304 and url in previous_previews:
+                previews.append(previous_previews[url])
+            elif status == 200:
+                previews.append(None)
+                to_parse.append((len(previews) - 1, html))
+            elif status is None:
+                previews.append("Error fetching preview")
+            else:
+                previews.append("No preview available")
+        
+        parsed = self._parse_many(parse_link_preview, [(html,) for _, html in to_parse])
+        for (position, _), (preview, error) in zip(to_parse, parsed):
+            previews[position] = preview if error is None else "Error fetching preview"
+        return previews
 
-    def search(self, query):
-        """Search the Law of One database for relevant answers to a query"""
-        query = query.lower()
+    def search(self, query, ranking=None, limit=5):
+        """Search the Law of One database for relevant answers to a query
+        
+        ranking selects the scorer ('legacy', 'bm25', 'tfidf' or 'fts5'); defaults to self.ranking.
+        limit is the number of results to return, best first. Results for a recently
+        seen query (compared case- and whitespace-insensitively) come from the response cache.
+        """
+        ranking = ranking or self.ranking
+        if ranking not in RANKING_MODES:
+            raise ValueError(f"Unknown ranking mode: {ranking}")
+        
+        start = time.perf_counter()
+        query = normalize_text(query)
+        key = ('search', ranking, limit, query)
+        hit, results = self.response_cache.get(key)
+        metrics.inc('soulcompass_response_cache_requests_total', kind='search', result='hit' if hit else 'miss')
+        if not hit:
+            results = self._search_many([query], ranking, limit)[0]
+            self.response_cache.put(key, results)
+        elapsed = time.perf_counter() - start
+        self.search_latency.record(elapsed)
+        metrics.observe('soulcompass_search_seconds', elapsed, ranking=ranking)
+        
+        # The result dicts are shared with the cache, so only the list is copied
+        return list(results)
+    
+    def search_many(self, queries, k=5, ranking=None):
+        """Search for several queries at once; returns one result list (as from search) per query
+        
+        The queries are scored together: TF-IDF with one sparse product, BM25 weighting each
+        distinct term's postings once, and legacy expanding each distinct query term against the
+        vocabulary once. Queries already in the response cache are not scored again.
+        """
+        ranking = ranking or self.ranking
+        if ranking not in RANKING_MODES:
+            raise ValueError(f"Unknown ranking mode: {ranking}")
+        
+        queries = [normalize_text(query) for query in queries]
+        results = {}
+        to_score = []
+        for query in dict.fromkeys(queries):
+            hit, cached = self.response_cache.get(('search', ranking, k, query))
+            metrics.inc('soulcompass_response_cache_requests_total', kind='search', result='hit' if hit else 'miss')
+            if hit:
+                results[query] = cached
+            else:
+                to_score.append(query)
+        
+        if to_score:
+            for query, query_results in zip(to_score, self._search_many(to_score, ranking, k)):
+                self.response_cache.put(('search', ranking, k, query), query_results)
+                results[query] = query_results
+        
+        return [list(results[query]) for query in queries]
+    
+    def _search_many(self, queries, ranking, limit):
+        """Run normalized queries without the response cache; returns one result list per query"""
+        if self.index is None:
+            self._build_index()
+        
+        if ranking == 'bm25':
+            all_scores = self.index.bm25.score_many(queries)
+            self._record_candidates(ranking, map(len, all_scores))
+            all_matches = [self._matches_from_scores(scores) for scores in all_scores]
+        elif ranking == 'tfidf':
+            if self.tfidf is None:
+                self._build_tfidf()
+            scores = self.tfidf.score_many(queries)
+            all_scores = [row_scores(scores, row) for row in range(len(queries))]
+            self._record_candidates(ranking, map(len, all_scores))
+            all_matches = [self._matches_from_scores(row) for row in all_scores]
+        elif ranking == 'fts5':
+            all_matches = [self._search_fts(query, limit) for query in queries]
+        else:
+            # Legacy scores every candidate's text, and common terms have most of the corpus
+            # as candidates, so its texts are held in memory once the first legacy search runs
+            self.index.load_texts()
+            expansions = self.index.expand_terms({term for query in queries for term in query.split()})
+            all_matches = [self._search_legacy(query, expansions) for query in queries]
+        
         results = []
+        for matches in all_matches:
+            # Select the best matches without sorting the rest; ties keep corpus order
+            top_matches = heapq.nlargest(limit, matches, key=lambda m: (m[0], -m[1]))
+            if metrics.enabled:
+                metrics.observe('soulcompass_search_hits', len(matches), ranking=ranking)
+                if top_matches:
+                    metrics.observe('soulcompass_search_top_score', top_matches[0][0], ranking=ranking)
+            
+            # Only the winners are turned into result dicts
+            results.append([self._build_result(match) for match in top_matches])
+        return results
+    
+    def _record_candidates(self, ranking, counts):
+        """Record the number of documents scored for each query of a search (if metrics are enabled)"""
+        if metrics.enabled:
+            for count in counts:
+                metrics.observe('soulcompass_search_candidates', count, ranking=ranking)
+    
+    def _search_legacy(self, query, expansions=None):
+        """Score matches with the original substring-count relevance
         
-        # Search in all Q&A pairs from lawofone.info
-        for session_id, session in self.sessions.items():
-            for qa_pair in session['qa_pairs']:
+        expansions optionally holds InvertedIndex.expand_terms results for the query terms.
+        Returns (relevance, order, ref, item_indexes) match tuples, see _build_result.
+        """
+        # The query is already normalized by search, like the indexed texts
+        query_terms = query.split()
+        matches = []
+        
+        # Only score the documents that contain at least one query term
+        candidates = self.index.candidates(query_terms, expansions)
+        self._record_candidates('legacy', [len(candidates)])
+        page_matches = {}
+        for doc_id, text in zip(candidates, self.index.get_texts(candidates)):
+            doc = self.index.documents[doc_id]
+            
+            if doc[0] == 'qa':
+                # Q&A pair from lawofone.info
                 # Check if query terms are in the question or answer
-                question = qa_pair['question'].lower()
-                answer = qa_pair['answer'].lower()
+                question, answer = text
                 
                 # Simple relevance score based on query term frequency
                 relevance = 0
@@ -333,7 +627,6 @@ class LawOfOneDatabase:
                     relevance += 5
                 
                 # Check for individual term matches
-                query_terms = query.split()
                 for term in query_terms:
                     if term in question:
                         relevance += 2
@@ -341,66 +634,135 @@ class LawOfOneDatabase:
                         relevance += 1
                 
                 if relevance > 0:
-                    results.append({
-                        'source': 'lawofone.info',
-                        'session_id': session_id,
-                        'qa_id': qa_pair['id'],
-                        'question': qa_pair['question'],
-                        'answer': qa_pair['answer'],
-                        'relevance': relevance,
-                        'url': f"{session['url']}#{qa_pair['id']}"
-                    })
-        
-        # Search in L/L Research content
-        for section_key, section_data in self.llresearch_content.items():
-            for page in section_data:
-                page_relevance = 0
-                relevant_content = []
+                    matches.append((relevance, doc_id, doc, None))
+            else:
+                # Item on an L/L Research page
+                _, section_key, page_index, item_index = doc
+                item_text_lower = text
                 
-                for item in page.get('content', []):
-                    item_text = ""
-                    
-                    if item['type'] == 'text':
-                        item_text = item['data'].lower()
-                    elif item['type'] == 'link':
-                        item_text = f"{item['data']['text']} {item['data']['content']}".lower()
-                    
-                    # Compute relevance
-                    item_relevance = 0
-                    
-                    # Check for exact matches
-                    if query in item_text:
-                        item_relevance += 5
-                    
-                    # Check for term matches
-                    query_terms = query.split()
-                    for term in query_terms:
-                        if term in item_text:
-                            item_relevance += 1
-                    
-                    if item_relevance > 0:
-                        page_relevance += item_relevance
-                        relevant_content.append(item['data'] if item['type'] == 'link' else item['data'])
+                # Compute relevance
+                item_relevance = 0
                 
-                if page_relevance > 0:
-                    results.append({
-                        'source': 'llresearch.org',
-                        'section': section_key,
-                        'title': page['title'],
-                        'content': relevant_content[:3],  # Limit to first 3 relevant items
-                        'relevance': page_relevance,
-                        'url': page['url']
-                    })
-        
-        # Sort by relevance score (descending)
-        results.sort(key=lambda x: x['relevance'], reverse=True)
-        
-        return results[:5]  # Return top 5 most relevant results
-
-    def get_ra_response(self, query):
-        """Get a Ra-like response to a query using the Law of One database"""
-        results = self.search(query)
+                # Check for exact matches
+                if query in item_text_lower:
+                    item_relevance += 5
+                
+                # Check for term matches
+                for term in query_terms:
+                    if term in item_text_lower:
+                        item_relevance += 1
+                
+                if item_relevance > 0:
+                    # [relevance, first doc_id, ref, item indexes]
+                    page_match = page_matches.setdefault((section_key, page_index), [0, doc_id, ('page', section_key, page_index), []])
+                    page_match[0] += item_relevance
+                    page_match[3].append(item_index)
+        
+        # Results for L/L Research content are grouped per page
+        matches.extend(tuple(page_match) for page_match in page_matches.values())
         
+        return matches
+    
+    def _search_fts(self, query, limit):
+        """Score matches with SQLite FTS5 bm25() against the cache store's full-text index"""
+        if self._store is None or not self._store.has_fts():
+            raise ValueError("The 'fts5' ranking mode requires a SQLite cache store with FTS5 support")
+        
+        # Quote each word so user input can't be parsed as FTS5 query syntax
+        terms = dict.fromkeys(tokenize(query))
+        if not terms:
+            return []
+        match = " OR ".join(f'"{term}"' for term in terms)
+        
+        # Several items of one L/L Research page collapse into one result, so keep
+        # fetching ranked rows until there are enough distinct results
+        scores = {}
+        batch_size = max(limit * 4, 20)
+        while True:
+            rows = self._store.search_fts(match, batch_size, offset=len(scores))
+            scores.update(rows)
+            matches = self._matches_from_scores(scores)
+            if len(rows) < batch_size or len(matches) >= limit:
+                self._record_candidates('fts5', [len(scores)])
+                return matches
+    
+    def _matches_from_scores(self, scores):
+        """Turn a dict of doc_id -> score (BM25 or TF-IDF) into match tuples"""
+        matches = []
+        page_matches = {}
+        
+        for doc_id, relevance in scores.items():
+            doc = self.index.documents[doc_id]
+            
+            if doc[0] == 'qa':
+                matches.append((relevance, doc_id, doc, None))
+            else:
+                page_matches.setdefault((doc[1], doc[2]), []).append((relevance, doc_id, doc[3]))
+        
+        # A page ranks by its best matching item, and shows its items best first
+        for (section_key, page_index), item_scores in page_matches.items():
+            item_scores.sort(key=lambda x: (-x[0], x[1]))
+            first_doc_id = min(doc_id for _, doc_id, _ in item_scores)
+            item_indexes = [item_index for _, _, item_index in item_scores]
+            matches.append((item_scores[0][0], first_doc_id, ('page', section_key, page_index), item_indexes))
+        
+        return matches
+    
+    def _build_result(self, match):
+        """Build the search result dict for a (relevance, order, ref, item_indexes) match
+        
+        ref is a ('qa', session_id, qa_index) or ('page', section_key, page_index) tuple;
+        item_indexes lists the matching items of an L/L Research page in display order.
+        order (the first matching doc_id) only breaks ties between equal relevances.
+        """
+        relevance, _, ref, item_indexes = match
+        
+        if ref[0] == 'qa':
+            _, session_id, qa_index = ref
+            session = self.sessions[session_id]
+            qa_pair = session['qa_pairs'][qa_index]
+            return {
+                'source': 'lawofone.info',
+                'session_id': session_id,
+                'qa_id': qa_pair['id'],
+                'question': qa_pair['question'],
+                'answer': qa_pair['answer'],
+                'relevance': relevance,
+                'url': f"{session['url']}#{qa_pair['id']}"
+            }
+        
+        _, section_key, page_index = ref
+        page = self.llresearch_content[section_key][page_index]
+        return {
+            'source': 'llresearch.org',
+            'section': section_key,
+            'title': page['title'],
+            'content': [page['content'][i]['data'] for i in item_indexes[:3]],  # Limit to first 3 relevant items
+            'relevance': relevance,
+            'url': page['url']
+        }
+
+    def get_ra_response(self, query, ranking=None):
+        """Get a Ra-like response to a query using the Law of One database (cached like search)"""
+        start = metrics.start_timer()
+        key = ('ra', ranking or self.ranking, normalize_text(query))
+        hit, response = self.response_cache.get(key)
+        metrics.inc('soulcompass_response_cache_requests_total', kind='ra_response', result='hit' if hit else 'miss')
+        if not hit:
+            response = self._compose_ra_response(query, ranking)
+            self.response_cache.put(key, response)
+        metrics.observe_since('soulcompass_ra_response_seconds', start, ranking=key[1])
+        return response
+    
+    def _compose_ra_response(self, query, ranking):
+        """Build a Ra-like response from the best search match"""
+        # Only the best match is used, so don't build the others
+        results = self.search(query, ranking=ranking, limit=1)
+        with metrics.timer('soulcompass_ra_format_seconds'):
+            return self._format_ra_response(results)
+    
+    def _format_ra_response(self, results):
+        """Format a Ra-like response from search results (best first)"""
         if not results:
             # Fallback responses if no match found
             return "I am Ra. This sphere of inquiry is not easily addressed through the limitations of your language and understanding. However, I encourage you to explore the Law of One for deeper insights."
@@ -425,7 +787,9 @@ class LawOfOneDatabase:
             response = "I am Ra. Based on material from L/L Research, I can share this insight: "
             
             if isinstance(content_snippets, list):
-                response += " ".join(content_snippets[:2])  # Use first two snippets
+                # Use first two snippets: paragraphs, or links (dicts) given by their text
+                snippets = [snippet if isinstance(snippet, str) else snippet.get('text', '') for snippet in content_snippets[:2]]
+                response += " ".join(snippet for snippet in snippets if snippet)
             else:
                 response += content_snippets
                 
@@ -0,0 +1,207 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Instrumentation is opt-in; when it is off every call returns straight away
+METRICS_ENABLED = os.environ.get("SOULCOMPASS_METRICS", "") == "1"
+
+# Serve the metrics in Prometheus text format on this port (only when enabled), on
+# localhost unless another interface is given
+METRICS_PORT = int(os.environ.get("SOULCOMPASS_METRICS_PORT", "0"))
+METRICS_HOST = os.environ.get("SOULCOMPASS_METRICS_HOST", "127.0.0.1")
+
+# The Metrics page is open to every visitor, so resetting the metrics from it needs this
+METRICS_ADMIN = os.environ.get("SOULCOMPASS_METRICS_ADMIN", "") == "1"
+
+# Histogram buckets (upper bounds)
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+COUNT_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000)
+SCORE_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 50, 100, 200)
+
+# Known metrics: name -> (type, help text, histogram buckets)
+METRICS = {
+    'soulcompass_cache_load_seconds': ('histogram', "Time to open the Law of One cache", SECONDS_BUCKETS),
+    'soulcompass_build_phase_seconds': ('histogram', "Time spent in each phase of a database build or refresh", SECONDS_BUCKETS),
+    'soulcompass_search_seconds': ('histogram', "Wall-clock time of search calls, including response cache hits", SECONDS_BUCKETS),
+    'soulcompass_search_candidates': ('histogram', "Documents scored per search query", COUNT_BUCKETS),
+    'soulcompass_search_hits': ('histogram', "Matching results per search query, before the limit", COUNT_BUCKETS),
+    'soulcompass_search_top_score': ('histogram', "Relevance of the best result per search query", SCORE_BUCKETS),
+    'soulcompass_response_cache_requests_total': ('counter', "Response cache lookups by search and get_ra_response", None),
+    'soulcompass_ra_response_seconds': ('histogram', "Wall-clock time of get_ra_response calls", SECONDS_BUCKETS),
+    'soulcompass_ra_format_seconds': ('histogram', "Time to format a Ra response from its search result", SECONDS_BUCKETS),
+    'soulcompass_page_render_seconds': ('histogram', "Time to run a page script once (one Streamlit rerun)", SECONDS_BUCKETS),
+}
+
+# Shared by every timer() of a disabled registry
+_NO_TIMER = nullcontext()
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)   # per bucket, not cumulative
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        # Values above the last bound only count towards +Inf
+        i = bisect.bisect_left(self.buckets, value)
+        if i < len(self.buckets):
+            self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+class Metrics:
+    """Thread-safe counters and histograms, keyed by metric name and labels
+
+    Disabled instances ignore every call, so instrumented code costs one attribute
+    check; compute expensive values under `if metrics.enabled:`.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counters = {}     # (name, labels) -> value
+        self._histograms = {}   # (name, labels) -> _Histogram
+
+    def inc(self, name, amount=1, **labels):
+        """Add to a counter"""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        """Record a value in a histogram"""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(METRICS.get(name, (None, None, SECONDS_BUCKETS))[2])
+            histogram.observe(value)
+
+    def timer(self, name, **labels):
+        """Return a context manager recording the duration of its with block in a histogram (in seconds)"""
+        if not self.enabled:
+            return _NO_TIMER
+        return self._timer(name, labels)
+
+    @contextmanager
+    def _timer(self, name, labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def start_timer(self):
+        """Return a start time for observe_since, or None when disabled"""
+        return time.perf_counter() if self.enabled else None
+
+    def observe_since(self, name, start, **labels):
+        """Record the seconds since start_timer() in a histogram"""
+        if start is not None:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def reset(self):
+        with self._lock:
+            self._counters = {}
+            self._histograms = {}
+
+    def snapshot(self):
+        """Return (counters, histograms) as lists of (name, labels dict, value or histogram dict)"""
+        with self._lock:
+            counters = [(name, dict(labels), value) for (name, labels), value in sorted(self._counters.items())]
+            histograms = [
+                (name, dict(labels), {'buckets': histogram.buckets, 'counts': list(histogram.counts),
+                                      'sum': histogram.sum, 'count': histogram.count})
+                for (name, labels), histogram in sorted(self._histograms.items())
+            ]
+        return counters, histograms
+
+    def render_prometheus(self):
+        """Return the metrics in the Prometheus text exposition format"""
+        counters, histograms = self.snapshot()
+        lines = []
+        described = set()
+
+        def describe(name, kind):
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {METRICS.get(name, (None, name, None))[1]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for name, labels, value in counters:
+            describe(name, 'counter')
+            lines.append(f"{name}{_labels(labels)} {value}")
+        for name, labels, histogram in histograms:
+            describe(name, 'histogram')
+            cumulative = 0
+            for bound, count in zip(histogram['buckets'], histogram['counts']):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(labels, le=_number(bound))} {cumulative}")
+            lines.append(f"{name}_bucket{_labels(labels, le='+Inf')} {histogram['count']}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(histogram['sum'])}")
+            lines.append(f"{name}_count{_labels(labels)} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+def histogram_quantile(histogram, q):
+    """Estimate the q-th quantile (0-1) of a snapshot histogram as the upper bound of its bucket
+
+    Returns None for an empty histogram, or inf when it lies above the last bucket.
+    """
+    if not histogram['count']:
+        return None
+    rank = q * histogram['count']
+    cumulative = 0
+    for bound, count in zip(histogram['buckets'], histogram['counts']):
+        cumulative += count
+        if cumulative >= rank:
+            return bound
+    return float('inf')
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _labels(labels, **extra):
+    labels = {**labels, **extra}
+    if not labels:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in labels.values())
+    return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + "}"
+
+# The process-wide registry used by the instrumented code
+metrics = Metrics(enabled=METRICS_ENABLED)
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = metrics.render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_metrics_server(port, host=METRICS_HOST):
+    """Serve /metrics (Prometheus text format) on a background thread; returns the server, or None if it can't listen"""
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+    except OSError as e:
+        # e.g. the port is in use; the app runs on without the endpoint
+        print(f"Not serving metrics on {host}:{port}: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    print(f"Serving metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
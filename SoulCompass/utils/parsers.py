@@ -0,0 +1,168 @@
+from bs4 import BeautifulSoup, FeatureNotFound
+
+def _pick_parser():
+    """Use the C-accelerated lxml parser when it is installed"""
+    try:
+        BeautifulSoup("", 'lxml')
+        return 'lxml'
+    except FeatureNotFound:
+        return 'html.parser'
+
+HTML_PARSER = _pick_parser()
+
+# The parsers below are plain top-level functions so they can run in a process pool:
+# each takes a page's HTML and returns plain data, with no network access
+
+def safe_parse(parser, *args):
+    """Call a parser, returning (result, None) or (None, error message)"""
+    try:
+        return parser(*args), None
+    except Exception as e:
+        return None, str(e)
+
+def parse_categories(html, lawofone_url):
+    """Parse the lawofone.info category list into {category_id: category}, or None"""
+    soup = BeautifulSoup(html, HTML_PARSER)
+    categories_div = soup.find('div', class_='categories')
+    if not categories_div:
+        return None
+
+    categories = {}
+    for link in categories_div.find_all('a'):
+        category_url = link.get('href')
+        category_name = link.text.strip()
+
+        # Extract category id from URL
+        category_id = category_url.split('/')[-2]
+
+        categories[category_id] = {
+            'name': category_name,
+            'url': f"{lawofone_url}{category_url}",
+            'questions': []
+        }
+    return categories
+
+def parse_category_questions(html, lawofone_url):
+    """Parse a category page into its list of questions, or None"""
+    soup = BeautifulSoup(html, HTML_PARSER)
+    questions_div = soup.find('div', class_='results')
+    if not questions_div:
+        return None
+
+    questions = []
+    for question in questions_div.find_all('div', class_='result'):
+        question_link = question.find('a')
+
+        if question_link:
+            question_url = question_link.get('href')
+            question_text = question_link.text.strip()
+
+            # Extract question ID
+            question_id = question_url.split('/')[-1]
+
+            questions.append({
+                'id': question_id,
+                'text': question_text,
+                'url': f"{lawofone_url}{question_url}",
+                'session': question_url.split('/')[2],  # Extract session from URL
+                'answer': None  # Will be populated when fetching sessions
+            })
+    return questions
+
+def parse_session_index(html):
+    """Parse the session list into the session page paths, in site order"""
+    soup = BeautifulSoup(html, HTML_PARSER)
+    return [link.get('href') for link in soup.select('ul.results-index a')]
+
+def parse_session(html, session_id):
+    """Parse a session page into its title and Q&A pairs"""
+    soup = BeautifulSoup(html, HTML_PARSER)
+
+    # Get title
+    title = soup.find('title').text if soup.find('title') else f"Session {session_id}"
+
+    # Get all Q&A pairs
+    qa_pairs = []
+
+    questions = soup.find_all('div', class_='q')
+    answers = soup.find_all('div', class_='a')
+
+    for i, (q, a) in enumerate(zip(questions, answers)):
+        q_text = q.get_text(strip=True).replace('Questioner:', '').strip()
+        a_text = a.get_text(strip=True).replace('Ra:', '').strip()
+
+        qa_pairs.append({
+            'id': f"{session_id}.{i+1}",
+            'question': q_text,
+            'answer': a_text
+        })
+
+    return {'title': title, 'qa_pairs': qa_pairs}
+
+def _content_div(soup):
+    """Find the main content of an L/L Research page"""
+    content_div = soup.find('div', class_='entry-content')
+    if not content_div:
+        content_div = soup.find('div', id='content')
+    return content_div
+
+def parse_llresearch_section(html, section_key, llresearch_url):
+    """Parse an L/L Research section page into (title, content items), or None
+
+    Link items get "PDF Document" as their content; previews of other links are
+    fetched and filled in by the caller.
+    """
+    soup = BeautifulSoup(html, HTML_PARSER)
+    content_div = _content_div(soup)
+    if not content_div:
+        return None
+
+    # Extract paragraphs of content
+    section_content = []
+    for p in content_div.find_all(['p', 'h2', 'h3', 'h4']):
+        # Skip empty paragraphs
+        if p.get_text(strip=True):
+            # Check if it contains a link
+            for link in p.find_all('a'):
+                href = link.get('href', '')
+                # Only process internal links or PDF links
+                if href and (href.startswith('/') or href.startswith(llresearch_url) or href.endswith('.pdf')):
+                    # Make sure the link is absolute
+                    if href.startswith('/'):
+                        href = f"{llresearch_url}{href}"
+
+                    # Store the link and its text
+                    section_content.append({
+                        'type': 'link',
+                        'data': {
+                            'text': link.get_text(strip=True),
+                            'url': href,
+                            'content': "PDF Document"
+                        }
+                    })
+
+            # Store the paragraph text
+            section_content.append({
+                'type': 'text',
+                'data': p.get_text(strip=True),
+                'tag': p.name
+            })
+
+    title = soup.find('title').text if soup.find('title') else section_key
+    return title, section_content
+
+def parse_link_preview(html):
+    """Parse the first few paragraphs of a linked page into a preview"""
+    soup = BeautifulSoup(html, HTML_PARSER)
+    content_div = _content_div(soup)
+    if not content_div:
+        return "No preview available"
+
+    paragraphs = content_div.find_all('p', limit=3)  # Limit to first 3 paragraphs
+    preview = "\n".join([p.get_text(strip=True) for p in paragraphs if p.get_text(strip=True)])
+
+    # Truncate if too long
+    if len(preview) > 500:
+        preview = preview[:500] + "..."
+
+    return preview
@@ -0,0 +1,103 @@
+import cProfile
+import datetime
+import os
+import pstats
+import threading
+from pathlib import Path
+
+import streamlit as st
+
+# Profile every page rerun with SOULCOMPASS_PROFILE=1
+PROFILE_ENABLED = os.environ.get("SOULCOMPASS_PROFILE", "") == "1"
+
+# With SOULCOMPASS_PROFILE_ALLOW_QUERY=1, ?profile=1 profiles the reruns of one visit
+PROFILE_ALLOW_QUERY = os.environ.get("SOULCOMPASS_PROFILE_ALLOW_QUERY", "") == "1"
+
+# Where the .prof files go (open them with pstats or snakeviz); only the newest are kept
+PROFILE_DIR = Path(os.environ.get("SOULCOMPASS_PROFILE_DIR", Path(__file__).parent.parent / "data" / "profiles"))
+PROFILE_MAX_FILES = int(os.environ.get("SOULCOMPASS_PROFILE_MAX_FILES", "50"))
+
+# Functions listed in the sidebar
+PROFILE_TOP_FUNCTIONS = 15
+
+# Enabled profilers, by the thread running their rerun
+_running = {}
+_running_lock = threading.Lock()
+
+def start_profile():
+    """Start profiling this rerun of the page script if profiling is on; returns the profiler or None"""
+    _disable_leftovers()
+    if not (PROFILE_ENABLED or (PROFILE_ALLOW_QUERY and st.query_params.get("profile") == "1")):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:
+        # From Python 3.12 only one profiler can run at a time, e.g. for concurrent sessions
+        print(f"Not profiling this rerun: {e}")
+        return None
+    with _running_lock:
+        _running[threading.current_thread()] = profiler
+    return profiler
+
+def _disable_leftovers():
+    """Disable the profilers of reruns cut short before finish_profile (an exception, st.stop or st.rerun)
+
+    Such a rerun is over once its thread starts another rerun or has ended. Left enabled,
+    the profiler would keep slowing the thread down, and from Python 3.12 it would hold
+    the one profiler slot of the interpreter.
+    """
+    current = threading.current_thread()
+    with _running_lock:
+        for thread in list(_running):
+            if thread is current or not thread.is_alive():
+                _running.pop(thread).disable()
+
+def finish_profile(profiler, page):
+    """Stop the profiler from start_profile, save the profile and show its top functions in the sidebar
+
+    Call it at the end of the page script; a rerun cut short (e.g. by st.rerun) isn't reported.
+    """
+    if profiler is None:
+        return
+    profiler.disable()
+    with _running_lock:
+        _running.pop(threading.current_thread(), None)
+
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    path = PROFILE_DIR / f"{page}-{datetime.datetime.now():%Y%m%d-%H%M%S-%f}.prof"
+    profiler.dump_stats(path)
+    _remove_old_profiles()
+
+    stats = pstats.Stats(profiler)
+    with st.sidebar.expander(f"Profile of this rerun ({stats.total_tt * 1000:.0f} ms)", expanded=True):
+        tab_cumulative, tab_own = st.tabs(["Cumulative time", "Own time"])
+        tab_cumulative.dataframe(top_functions(stats, 'cumulative'), hide_index=True)
+        tab_own.dataframe(top_functions(stats, 'own'), hide_index=True)
+        st.caption(f"Saved to {path}")
+        st.download_button("Download profile", path.read_bytes(), file_name=path.name,
+                           mime="application/octet-stream", key=f"download_profile_{page}")
+
+def _remove_old_profiles():
+    """Delete all but the newest PROFILE_MAX_FILES profiles"""
+    try:
+        profiles = sorted(PROFILE_DIR.glob("*.prof"), key=lambda path: path.stat().st_mtime, reverse=True)
+        for path in profiles[PROFILE_MAX_FILES:]:
+            path.unlink(missing_ok=True)
+    except OSError as e:
+        # Another session may be cleaning up at the same time
+        print(f"Error removing old profiles: {e}")
+
+def top_functions(stats, sort='cumulative', limit=PROFILE_TOP_FUNCTIONS):
+    """Return rows for the functions with the most cumulative (or own) time in a pstats.Stats"""
+    column = 3 if sort == 'cumulative' else 2
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][column], reverse=True)[:limit]
+    return [
+        {
+            'function': f"{Path(filename).name}:{line}({name})" if line else name,
+            'calls': calls,
+            'own ms': round(own_time * 1000, 2),
+            'cumulative ms': round(cumulative_time * 1000, 2)
+        }
+        for (filename, line, name), (_, calls, own_time, cumulative_time, _) in rows
+    ]
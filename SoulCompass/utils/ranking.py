@@ -0,0 +1,95 @@
+import math
+import re
+from array import array
+from collections import Counter, defaultdict
+
+# Words are runs of letters/digits, keeping inner apostrophes ("Ra's", "don't")
+WORD_RE = re.compile(r"[a-z0-9]+(?:'[a-z0-9]+)*")
+
+def tokenize(text):
+    """Split text into lower-cased word tokens"""
+    return WORD_RE.findall(text.lower())
+
+def normalize_text(text):
+    """Lower-case text and collapse its whitespace
+
+    Punctuation is kept, since the legacy ranking matches query substrings like "one?".
+    """
+    return " ".join(text.lower().split())
+
+class BM25Index:
+    """Okapi BM25 statistics precomputed over a fixed collection of documents"""
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}      # term -> (array of doc_ids, array of term frequencies)
+        self.idf = {}           # term -> inverse document frequency
+        self.doc_lengths = []   # doc_id -> number of tokens
+        self.avg_length = 0.0
+        self.length_norms = []  # doc_id -> k1 * (1 - b + b * length / avg_length)
+
+    @classmethod
+    def build(cls, texts, k1=1.5, b=0.75):
+        """Build the statistics from an iterable of document texts (doc_id = position)"""
+        bm25 = cls(k1=k1, b=b)
+        postings = defaultdict(list)
+
+        for doc_id, text in enumerate(texts):
+            tokens = tokenize(text)
+            bm25.doc_lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings[term].append((doc_id, tf))
+
+        doc_count = len(bm25.doc_lengths)
+        bm25.avg_length = sum(bm25.doc_lengths) / doc_count if doc_count else 0.0
+
+        # Non-negative IDF variant, so very common terms never subtract from a score
+        for term, term_postings in postings.items():
+            df = len(term_postings)
+            bm25.idf[term] = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+
+        # Compact arrays pickle as raw bytes, keeping the cached index small and fast to load
+        bm25.postings = {
+            term: (array('I', [doc_id for doc_id, _ in term_postings]), array('I', [tf for _, tf in term_postings]))
+            for term, term_postings in postings.items()
+        }
+        avg_length = bm25.avg_length or 1.0
+        bm25.doc_lengths = array('I', bm25.doc_lengths)
+        bm25.length_norms = array('d', [k1 * (1 - b + b * length / avg_length) for length in bm25.doc_lengths])
+        return bm25
+
+    def score(self, query):
+        """Return a dict of doc_id -> BM25 score for every document matching the query"""
+        return self.score_many([query])[0]
+
+    def score_many(self, queries):
+        """Score several queries, returning one doc_id -> BM25 score dict per query
+
+        Each distinct term's postings are read and weighted once, however many
+        queries contain it.
+        """
+        query_terms = [set(tokenize(query)) for query in queries]
+        k1_plus_1 = self.k1 + 1
+        length_norms = self.length_norms
+
+        # term -> [(doc_id, weight)] for the terms of all the queries
+        weights = {}
+        for term in set().union(*query_terms):
+            term_postings = self.postings.get(term)
+            if not term_postings:
+                continue
+            idf = self.idf[term]
+            weights[term] = [
+                (doc_id, idf * tf * k1_plus_1 / (tf + length_norms[doc_id]))
+                for doc_id, tf in zip(*term_postings)
+            ]
+
+        all_scores = []
+        for terms in query_terms:
+            scores = defaultdict(float)
+            for term in terms:
+                for doc_id, weight in weights.get(term, ()):
+                    scores[doc_id] += weight
+            all_scores.append(scores)
+        return all_scores
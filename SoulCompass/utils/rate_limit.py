@@ -0,0 +1,35 @@
+import threading
+import time
+
+class TokenBucket:
+    """Thread-safe token bucket rate limiter shared by all scraping workers"""
+
+    def __init__(self, rate, capacity=None):
+        # rate is in tokens (requests) per second; a falsy rate disables limiting
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate or 0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Block until the tokens are available; returns the seconds spent waiting"""
+        if not self.rate:
+            return 0.0
+
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+
+                wait = (tokens - self.tokens) / self.rate
+
+            # Sleep outside the lock so other workers can refill/check meanwhile
+            time.sleep(wait)
+            waited += wait
@@ -0,0 +1,117 @@
+import hashlib
+from array import array
+from collections import defaultdict
+
+from .ranking import BM25Index, normalize_text
+
+# Bump this whenever the index layout changes so stale cached indexes get rebuilt
+INDEX_VERSION = 6
+
+class InvertedIndex:
+    """Term -> postings index over the Law of One Q&A pairs and L/L Research items"""
+
+    def __init__(self):
+        # Each document is a reference back into the database:
+        #   ('qa', session_id, qa_index)
+        #   ('ll', section_key, page_index, item_index)
+        self.version = INDEX_VERSION
+        self.documents = []
+        # doc_id -> normalized text, computed once here so searches never re-normalize
+        # the corpus: a (question, answer) tuple for Q&A pairs, a string for items.
+        # A list while the index is built; the cache store keeps the texts in a table of
+        # their own rather than in the pickled index, and load_cache attaches a reader for it
+        # (load_texts reads them back into a list, for the legacy ranking)
+        self.texts = []
+        self.postings = {}  # token -> array of doc ids
+        self.bm25 = None
+        # Hash of the documents and their texts, identifying this version of the corpus
+        self.fingerprint = None
+
+    @classmethod
+    def build(cls, sessions, llresearch_content):
+        """Build the index from the sessions and L/L Research content dicts"""
+        index = cls()
+        postings = defaultdict(list)
+        digest = hashlib.sha1()
+
+        def add_document(ref, text):
+            doc_id = len(index.documents)
+            index.documents.append(ref)
+            index.texts.append(text)
+            digest.update(repr((ref, text)).encode('utf-8'))
+            # Tokens are whitespace-delimited runs of the normalized text, so a
+            # query term is a substring of the text exactly when it is a substring
+            # of one of its tokens
+            for token in set(index.document_text(doc_id).split()):
+                postings[token].append(doc_id)
+
+        for session_id, session in sessions.items():
+            for qa_index, qa_pair in enumerate(session['qa_pairs']):
+                add_document(('qa', session_id, qa_index), (normalize_text(qa_pair['question']), normalize_text(qa_pair['answer'])))
+
+        for section_key, section_data in llresearch_content.items():
+            for page_index, page in enumerate(section_data):
+                for item_index, item in enumerate(page.get('content', [])):
+                    add_document(('ll', section_key, page_index, item_index), normalize_text(item_text(item)))
+
+        # Compact arrays pickle as raw bytes, keeping the cached index small and fast to load
+        index.postings = {token: array('I', doc_ids) for token, doc_ids in postings.items()}
+        index.bm25 = BM25Index.build(index.document_texts())
+        index.fingerprint = digest.hexdigest()
+        return index
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['texts'] = None
+        return state
+
+    def document_text(self, doc_id):
+        """Return the normalized searchable text of a document as one string"""
+        return _joined(self.texts[doc_id])
+
+    def document_texts(self):
+        """Yield the normalized searchable text of every document as one string, in doc_id order"""
+        texts = self.texts if isinstance(self.texts, list) else self.texts.iter_all()
+        return (_joined(text) for text in texts)
+
+    def load_texts(self):
+        """Read the texts into memory if they come from the cache store (one sequential scan)"""
+        if self.texts is not None and not isinstance(self.texts, list):
+            self.texts = list(self.texts.iter_all())
+
+    def get_texts(self, doc_ids):
+        """Return the normalized texts (as stored in texts) of the given documents, in order"""
+        if isinstance(self.texts, list):
+            return [self.texts[doc_id] for doc_id in doc_ids]
+        return self.texts.get_many(doc_ids)
+
+    def expand_term(self, term):
+        """Return the indexed tokens that contain the given query term"""
+        return [token for token in self.postings if term in token]
+
+    def expand_terms(self, terms):
+        """Return {term: indexed tokens containing it}, expanding each distinct term once"""
+        return {term: self.expand_term(term) for term in set(terms)}
+
+    def candidates(self, terms, expansions=None):
+        """Return the sorted ids of all documents containing any of the terms
+
+        expansions may hold precomputed expand_terms results covering the terms.
+        """
+        doc_ids = set()
+        for term in set(terms):
+            tokens = expansions[term] if expansions is not None else self.expand_term(term)
+            for token in tokens:
+                doc_ids.update(self.postings[token])
+        return sorted(doc_ids)
+
+def _joined(text):
+    return text if isinstance(text, str) else " ".join(text)
+
+def item_text(item):
+    """Return the searchable text of an L/L Research content item"""
+    if item['type'] == 'text':
+        return item['data']
+    elif item['type'] == 'link':
+        return f"{item['data']['text']} {item['data']['content']}"
+    return ""
@@ -0,0 +1,103 @@
+from collections import Counter
+
+from .ranking import tokenize
+
+# NumPy/SciPy are only needed for the 'tfidf' ranking mode
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = None
+    sparse = None
+
+def tfidf_available():
+    """Return True if NumPy and SciPy are installed"""
+    return np is not None and sparse is not None
+
+class TfidfMatrix:
+    """Sparse, L2-normalized TF-IDF matrix with one row per document"""
+
+    def __init__(self, vocabulary, idf, matrix):
+        self.vocabulary = vocabulary  # term -> column
+        self.idf = idf                # column -> inverse document frequency
+        self.matrix = matrix          # CSR matrix, documents x terms
+
+    @classmethod
+    def build(cls, texts):
+        """Build the matrix from an iterable of document texts (row = position)"""
+        if not tfidf_available():
+            raise ImportError("The 'tfidf' ranking mode requires numpy and scipy")
+
+        vocabulary = {}
+        indptr = [0]
+        indices = []
+        counts = []
+        for text in texts:
+            for term, tf in Counter(tokenize(text)).items():
+                indices.append(vocabulary.setdefault(term, len(vocabulary)))
+                counts.append(tf)
+            indptr.append(len(indices))
+
+        counts = sparse.csr_matrix(
+            (np.asarray(counts, dtype=np.float32), np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int64)),
+            shape=(len(indptr) - 1, len(vocabulary))
+        )
+
+        # Smoothed IDF, as in scikit-learn: log((1 + n) / (1 + df)) + 1
+        doc_count = counts.shape[0]
+        df = np.bincount(counts.indices, minlength=len(vocabulary))
+        idf = (np.log((1 + doc_count) / (1 + df)) + 1).astype(np.float32)
+
+        # Sublinear term frequency damps long answers that repeat a word many times
+        matrix = counts.copy()
+        matrix.data = (1 + np.log(matrix.data)) * idf[matrix.indices]
+        return cls(vocabulary, idf, _normalize_rows(matrix))
+
+    def transform(self, queries):
+        """Turn a list of query strings into an L2-normalized query x term matrix"""
+        indptr = [0]
+        indices = []
+        counts = []
+        for query in queries:
+            for term, tf in Counter(tokenize(query)).items():
+                column = self.vocabulary.get(term)
+                if column is not None:
+                    indices.append(column)
+                    counts.append(tf)
+            indptr.append(len(indices))
+
+        matrix = sparse.csr_matrix(
+            (np.asarray(counts, dtype=np.float32), np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int64)),
+            shape=(len(queries), len(self.vocabulary))
+        )
+        matrix.data = (1 + np.log(matrix.data)) * self.idf[matrix.indices]
+        return _normalize_rows(matrix)
+
+    def score_many(self, queries):
+        """Score every document against every query with one sparse product
+
+        Returns a CSR matrix of cosine similarities, queries x documents.
+        """
+        return (self.transform(queries) @ self.matrix.T).tocsr()
+
+    def score(self, query):
+        """Return a dict of doc_id -> cosine similarity for documents matching the query"""
+        return row_scores(self.score_many([query]), 0)
+
+def row_scores(scores, row):
+    """Return the non-zero entries of one row of a score matrix as a dict"""
+    start, end = scores.indptr[row], scores.indptr[row + 1]
+    return dict(zip(scores.indices[start:end].tolist(), scores.data[start:end].tolist()))
+
+def _normalize_rows(matrix):
+    """Scale each row of a CSR matrix to unit L2 norm (empty rows stay empty)
+
+    The norms are summed row by row in float64, so a row's result doesn't depend on
+    the other rows in the matrix (a query scores the same alone or in a batch).
+    """
+    rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    norms = np.zeros(matrix.shape[0])
+    np.add.at(norms, rows, matrix.data.astype(np.float64) ** 2)
+    norms = np.sqrt(norms)
+    norms[norms == 0] = 1
+    return sparse.csr_matrix(sparse.diags((1 / norms).astype(matrix.dtype)) @ matrix)